@@ -10,200 +10,422 @@ WHAT'S NEW in v2.0:
   - Audience gap detection from comment threads
   - Image post brief extraction feed
   - Reads brand context from config/brand_voice.json
+  - Analysis sections are structured JSON (see SECTION_SCHEMAS), not prose
 """
 
 import os
-import json
+import re
+import heapq
+import hashlib
+import asyncio
+import logging
+import orjson
+import numpy as np
 from datetime import datetime
-from google import genai
+from functools import cached_property
+from operator import itemgetter
 from google.genai import types
 from dotenv import load_dotenv
-from agents.gemini_utils import gemini_with_retry
+from agents.gemini_utils import gemini_with_retry_async, shared_client, FAST_MODELS, SMART_MODELS
+from agents.io_utils import load_ndjson_cached, load_brand_voice, save_json
+
+log = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Context budget — the same context is sent in every analysis batch
+CONTEXT_TWEET_CHARS  = 240
+CONTEXT_REPLY_CHARS  = 120
+CONTEXT_MIN_FOR_TRIM = 8     # below this many posts, keep even the weakest quartile
+
+# A reply counts as an audience question if it has a "?" / "¿", a question
+# word, or an ask phrased as a statement ("anyone know a good...")
+_QUESTION_RE = re.compile(
+    r"[?¿]|\b(?:how|what|why|which|does|can|should|best|anyone\s+know|is\s+there\s+a)\b",
+    re.IGNORECASE,
+)
+
+
+# ── RESPONSE SCHEMAS ────────────────────────────────────────
+# Every analysis section comes back as structured JSON, so downstream agents
+# read fields instead of re-parsing numbered prose.
+_STR      = types.Schema(type=types.Type.STRING)
+_STR_LIST = types.Schema(type=types.Type.ARRAY, items=_STR)
+
+
+def _object(**fields):
+    return types.Schema(type=types.Type.OBJECT, properties=fields, required=list(fields))
+
+
+def _list_of(**fields):
+    return types.Schema(type=types.Type.ARRAY, items=_object(**fields))
+
+
+SECTION_SCHEMAS = {
+    "content_gaps":        _list_of(question=_STR, why_valuable=_STR, our_post=_STR),
+    "tone_fingerprints":   _list_of(account=_STR, tone=_STR, hook_style=_STR,
+                                    strengths=_STR, weaknesses=_STR, voice=_STR),
+    "engagement_patterns": _list_of(pattern=_STR, evidence=_STR),
+    "competitor_pillars":  _object(by_competitor=_list_of(account=_STR, pillars=_STR_LIST),
+                                   uncovered=_STR_LIST),
+    "our_opportunities":   _list_of(topic=_STR, angle=_STR, why_it_wins=_STR,
+                                    hook_style=_STR, format=_STR),
+}
+
+
+# Sections answered by each batched request
+DESCRIPTIVE_SECTIONS = ["tone_fingerprints", "engagement_patterns", "competitor_pillars"]
+STRATEGY_SECTIONS    = ["content_gaps", "our_opportunities"]
+
+# Finished sections are checkpointed here until the full report is saved, so a
+# failure in one batch does not force the other to be paid for again.
+PARTIAL_DIR = os.path.join("data", ".partial")
+
+
+def _parses_as_object(raw):
+    """True if raw is a complete JSON object — the shape every batched reply has."""
+    try:
+        return isinstance(orjson.loads(raw), dict)
+    except (orjson.JSONDecodeError, TypeError):
+        return False
+
+
+def _engagement_scores(tweets):
+    """likes + 2·retweets + 3·replies for every tweet, in one vectorised pass."""
+    n = len(tweets)
+    likes    = np.fromiter((t.get("likes", 0)    for t in tweets), dtype=np.int64, count=n)
+    retweets = np.fromiter((t.get("retweets", 0) for t in tweets), dtype=np.int64, count=n)
+    replies  = np.fromiter((t.get("replies", 0)  for t in tweets), dtype=np.int64, count=n)
+    return likes + 2 * retweets + 3 * replies
+
+
+def _context_line(t, score):
+    """One post (+ up to 3 clipped comments) as a single analysis-context line."""
+    replies = t.get("raw_replies") or ()
+    tail = (" | Comments: " + " / ".join(r["text"][:CONTEXT_REPLY_CHARS] for r in replies[:3])
+            if replies else "")
+    return f"@{t['author']} [score:{score}]: {t['text'][:CONTEXT_TWEET_CHARS]}{tail}"
+
 
 class AuditorAgent:
     def __init__(self):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("[FAIL] GEMINI_API_KEY missing from .env")
-        self.client = genai.Client(api_key=api_key)
+        self.client = shared_client(api_key)
 
-        self.today = datetime.now().strftime("%Y-%m-%d")
-        self.intel_file  = f"data/raw_tweets_{self.today}.json"
-        self.report_file = f"data/competitor_report_{self.today}.json"
+        # Tone / pillar / pattern extraction is routine summarisation;
+        # gaps and opportunities need the stronger model.
+        self.fast_models  = FAST_MODELS
+        self.smart_models = SMART_MODELS
 
         self.brand_voice = self._load_brand_voice()
 
+    # Date and paths are resolved on first use and pinned until refresh_day(),
+    # which run() calls — every run reads and writes one day's files, even
+    # across midnight, and a long-lived agent still moves on to the next day.
+    @cached_property
+    def today(self):
+        return datetime.now().strftime("%Y-%m-%d")
+
+    @cached_property
+    def intel_file(self):
+        return f"data/raw_tweets_{self.today}.ndjson"
+
+    @cached_property
+    def report_file(self):
+        return f"data/competitor_report_{self.today}.json"
+
+    def refresh_day(self):
+        for attr in ("today", "intel_file", "report_file"):
+            self.__dict__.pop(attr, None)
+
     def _load_brand_voice(self):
-        try:
-            with open("config/brand_voice.json", "r") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            print("[WARN] config/brand_voice.json not found. Running without brand context.")
+        brand_voice = load_brand_voice()
+        if brand_voice is None:
+            log.warning("[WARN] config/brand_voice.json not found. Running without brand context.")
             return {}
+        return brand_voice
 
     def run(self):
-        print("[AUDITOR] Auditor Agent active. Running deep competitive analysis...")
+        self.refresh_day()
+        return asyncio.run(self._run_async())
+
+    async def _run_async(self):
+        log.info("[AUDITOR] Auditor Agent active. Running deep competitive analysis...")
 
         tweets = self._load_intel()
         if not tweets:
-            print("[WARN] No tweet data found. Run Spy Agent first.")
+            log.warning("[WARN] No tweet data found. Run Spy Agent first.")
             self._save_report({})
             return {}
 
-        print(f"[AUDITOR] Analyzing {len(tweets)} posts from last 7 days...")
+        log.info("[AUDITOR] Analyzing %d posts from last 7 days...", len(tweets))
+
+        # Score every post once; context and engagement ranking both reuse it
+        scores  = _engagement_scores(tweets)
+        context = self._build_analysis_context(tweets, scores)
+
+        # Partition once — the Image Analyst feed only ever looks at image posts
+        image_posts = [t for t in tweets if t.get("has_images")]
 
-        # Build analysis context
-        context = self._build_analysis_context(tweets)
+        # Run all Gemini analysis passes as two batched requests
+        analysis = await self._analyze_all(context, tweets, scores)
 
-        # Run all analysis passes
         report = {
             "generated_at":       self.today,
             "posts_analyzed":     len(tweets),
-            "content_gaps":       self._analyze_content_gaps(context),
-            "tone_fingerprints":  self._analyze_tone_fingerprints(context),
-            "engagement_patterns":self._analyze_engagement_patterns(tweets),
+            "content_gaps":       analysis["content_gaps"],
+            "tone_fingerprints":  analysis["tone_fingerprints"],
+            "engagement_patterns":analysis["engagement_patterns"],
             "audience_questions": self._extract_audience_questions(tweets),
-            "image_post_briefs":  self._analyze_image_posts(tweets),
-            "competitor_pillars": self._map_content_pillars(context),
-            "our_opportunities":  self._identify_our_opportunities(context),
+            "image_post_briefs":  self._analyze_image_posts(image_posts),
+            "competitor_pillars": analysis["competitor_pillars"],
+            "our_opportunities":  analysis["our_opportunities"],
         }
 
         self._save_report(report)
+        self._clear_checkpoints()  # the report now holds every section
         return report
 
     # ─────────────────────────────────────────────
     # CONTEXT BUILDER
     # ─────────────────────────────────────────────
 
-    def _build_analysis_context(self, tweets):
-        """Build a condensed text summary of all competitor posts for Gemini analysis."""
-        lines = []
-        for t in tweets:
-            engagement = t.get("likes", 0) + t.get("retweets", 0) * 2 + t.get("replies", 0) * 3
-            replies_text = ""
-            if t.get("raw_replies"):
-                top_replies = t["raw_replies"][:3]
-                replies_text = " | Comments: " + " / ".join(r["text"] for r in top_replies)
-
-            lines.append(
-                f"@{t['author']} [score:{engagement}]: {t['text']}{replies_text}"
-            )
-
+    def _build_analysis_context(self, tweets, scores):
+        """
+        Build a condensed text summary of competitor posts for Gemini analysis.
+        Post and comment text is clipped, repeated posts (reposts, copy-paste
+        spam) are sent once, and on larger dumps the bottom engagement quartile
+        is dropped — it adds tokens but little signal.
+        """
+        floor = np.percentile(scores, 25) if len(tweets) >= CONTEXT_MIN_FOR_TRIM else float("-inf")
+
+        def kept_posts():
+            seen = set()
+            for t, score in zip(tweets, scores.tolist()):
+                key = (t["author"], t["text"][:CONTEXT_TWEET_CHARS])
+                if score < floor or key in seen:
+                    continue
+                seen.add(key)
+                yield t, score
+
+        body = "\n".join(_context_line(t, score) for t, score in kept_posts())
         brand_pillars = ", ".join(self.brand_voice.get("content_pillars", []))
-        return "\n".join(lines) + f"\n\nOUR BRAND PILLARS: {brand_pillars}"
+        return f"{body}\n\nOUR BRAND PILLARS: {brand_pillars}"
 
     # ─────────────────────────────────────────────
-    # ANALYSIS METHODS
+    # BATCHED ANALYSIS
     # ─────────────────────────────────────────────
 
-    def _analyze_content_gaps(self, context):
-        """Find topics the audience asks about that competitors don't fully answer."""
-        print("[AUDITOR] Detecting content gaps...")
+    async def _analyze_all(self, context, tweets, scores):
+        """
+        Run every Gemini analysis pass in two batched JSON requests instead of
+        one request per section. The shared competitor context is sent once per
+        batch. Sections are grouped by temperature:
+          - descriptive (0.4): tone fingerprints, engagement patterns, pillars
+          - strategic   (0.55): content gaps, our opportunities
+        The two batches are independent, so they run concurrently.
+        """
+        # Checkpoints are only valid for the intel they were built from: a
+        # re-scrape changes the file (and usually the context), so the tag does too
+        st  = os.stat(self.intel_file)
+        tag = hashlib.blake2b(f"{st.st_mtime_ns}:{st.st_size}:{context}".encode("utf-8"),
+                              digest_size=8).hexdigest()
+        results = await asyncio.gather(
+            self._checkpointed(DESCRIPTIVE_SECTIONS, tag,
+                               lambda: self._analyze_descriptive(context, tweets, scores)),
+            self._checkpointed(STRATEGY_SECTIONS, tag,
+                               lambda: self._analyze_strategy(context)),
+            return_exceptions=True)  # let the other batch finish and checkpoint
+
+        for r in results:
+            if isinstance(r, BaseException):
+                raise r
+        descriptive, strategy = results
+        return {**descriptive, **strategy}
+
+    async def _checkpointed(self, keys, tag, analyze):
+        """
+        Reuse checkpointed sections for this intel version (tag) if all exist;
+        else run analyze() and checkpoint. An unreadable checkpoint is a miss.
+        """
+        paths = {k: os.path.join(PARTIAL_DIR, f"{k}_{self.today}_{tag}.json") for k in keys}
+        try:
+            sections = {}
+            for k, path in paths.items():
+                with open(path, "rb") as f:
+                    sections[k] = orjson.loads(f.read())
+            log.info("[AUDITOR] Reusing checkpointed sections: %s", ", ".join(keys))
+            return sections
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            pass
+
+        sections = await analyze()
+        os.makedirs(PARTIAL_DIR, exist_ok=True)
+        for k, path in paths.items():
+            save_json(path, sections[k])
+        return sections
+
+    def _clear_checkpoints(self):
+        """Drop every checkpoint — the report holds today's sections, older ones are stale."""
+        try:
+            entries = list(os.scandir(PARTIAL_DIR))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.name.endswith(".json"):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
 
-        brand_name = self.brand_voice.get("brand_name", "MIC")
-        niche = self.brand_voice.get("niche", "audio technology")
+    async def _analyze_descriptive(self, context, tweets, scores):
+        """Tone fingerprints, engagement patterns and content pillars in one call."""
+        log.info("[AUDITOR] Mapping tone fingerprints, engagement patterns and content pillars...")
 
-        prompt = f"""
-You are a content strategist for {brand_name}, a brand in {niche}.
+        top_text, bot_text = self._engagement_extremes(tweets, scores)
 
-Here is the last 7 days of competitor posts and their audience comments:
+        prompt = f"""
+Here are the last 7 days of competitor posts and their audience comments:
 
 {context}
 
-TASK: Identify the top 3 CONTENT GAPS — topics the audience is clearly asking about
-in the comments that competitors never properly answered.
+TOP 5 highest-engagement competitor posts this week:
+{top_text}
+
+BOTTOM 5 lowest-engagement posts this week:
+{bot_text}
+
+Complete ALL of the following tasks. Keep every field short and specific.
 
-For each gap:
-1. What is the unanswered question?
-2. Why is this a high-value gap to fill?
-3. What should {brand_name} post to own this topic?
+tone_fingerprints — one entry per competitor account:
+  - tone: e.g. educational, hype-driven, casual, authoritative
+  - hook_style: how they typically open posts
+  - strengths / weaknesses: what makes their content engaging or weak
+  - voice: one sentence, their brand voice in plain English
 
-Be specific. No vague advice. Reference actual posts and comments where possible.
-Format: Numbered list, 3 gaps max.
+engagement_patterns — 3-5 specific, actionable patterns that explain why the top
+  posts outperform the bottom posts (hook structure, topic type, length,
+  controversy level, educational value). No generic advice.
+  - evidence: the posts that show the pattern
+
+competitor_pillars:
+  - by_competitor: the 3-5 recurring CONTENT PILLARS (topics they post about
+    repeatedly) for each competitor
+  - uncovered: pillars they do NOT cover that our audience would value
 """
-        return gemini_with_retry(
-            self.client,
-            lambda model: self.client.models.generate_content(
-                model=model,
-                contents=prompt,
-                config=types.GenerateContentConfig(temperature=0.5)
-            ).text.strip()
+        return await self._run_batch(
+            prompt,
+            DESCRIPTIVE_SECTIONS,
+            temperature=0.4,
+            models=self.fast_models,
         )
 
-    def _analyze_tone_fingerprints(self, context):
-        """Map the tone and writing style of each competitor."""
-        print("[AUDITOR] Mapping competitor tone fingerprints...")
+    async def _analyze_strategy(self, context):
+        """Content gaps and our post opportunities in one call."""
+        log.info("[AUDITOR] Detecting content gaps and our best opportunities this week...")
+
+        brand_name = self.brand_voice.get("brand_name", "MIC")
+        niche = self.brand_voice.get("niche", "audio technology")
+        pillars = ", ".join(self.brand_voice.get("content_pillars", []))
+        hook_styles = ", ".join(self.brand_voice.get("hook_styles", []))
+        tone = self.brand_voice.get("tone", {}).get("adjectives", [])
+        examples = self.brand_voice.get("example_posts", [])
+        example_text = "\n".join(f'- "{e}"' for e in examples[:2])
 
         prompt = f"""
-Analyze the writing style and tone of each competitor in these posts:
+You are a senior content strategist for {brand_name}, a brand in {niche}.
 
-{context}
+OUR BRAND:
+- Voice: {", ".join(tone)}
+- Pillars: {pillars}
+- Hook styles we use: {hook_styles}
 
-For each competitor account, identify:
-- Tone (e.g. educational, hype-driven, casual, authoritative)
-- Typical hook style (how they open posts)
-- What makes their content engaging or weak
-- One sentence: their brand voice in plain English
+OUR VOICE EXAMPLES:
+{example_text}
 
-Keep each analysis to 3-4 bullet points.
+COMPETITOR LANDSCAPE THIS WEEK (posts and their audience comments):
+{context}
+
+Complete BOTH of the following tasks. Keep every field short and specific.
+
+content_gaps — the top 3 (max) topics the audience is clearly asking about in the
+  comments that competitors never properly answered:
+  - question: the unanswered question
+  - why_valuable: why this is a high-value gap to fill
+  - our_post: what {brand_name} should post to own this topic
+  Reference actual posts and comments where possible. No vague advice.
+
+our_opportunities — the TOP 3 post opportunities for {brand_name} this week:
+  - topic / angle: what we should post
+  - why_it_wins: why this will win vs what competitors posted
+  - hook_style: which of our hook styles to use
+  - format: thread / single tweet / image post
+  Reference actual competitor gaps or weaknesses where possible.
 """
-        return gemini_with_retry(
-            self.client,
-            lambda model: self.client.models.generate_content(
-                model=model,
-                contents=prompt,
-                config=types.GenerateContentConfig(temperature=0.4)
-            ).text.strip()
+        return await self._run_batch(
+            prompt,
+            STRATEGY_SECTIONS,
+            temperature=0.55,
+            models=self.smart_models,
         )
 
-    def _analyze_engagement_patterns(self, tweets):
-        """Detect what post types and topics drive the most engagement."""
-        print("[AUDITOR] Detecting engagement patterns...")
+    async def _run_batch(self, prompt, keys, temperature, models):
+        """Send one batched prompt and return {key: structured section} for the requested keys."""
+        schema = _object(**{k: SECTION_SCHEMAS[k] for k in keys})
+        raw = await gemini_with_retry_async(
+            lambda model, client: self._request(client, model, prompt, temperature, schema),
+            models=models,
+            cache_key=f"auditor|{temperature}|{','.join(keys)}|{prompt}",
+            cache_if=_parses_as_object,   # a truncated reply is retried next run, not pinned
+        )
+        data = orjson.loads(raw)
+        # A missing section still gets its schema's shape ({} for competitor_pillars)
+        return {k: data.get(k) or ({} if SECTION_SCHEMAS[k].type == types.Type.OBJECT else [])
+                for k in keys}
+
+    async def _request(self, client, model, prompt, temperature, schema):
+        # Stream so decoding overlaps with the other in-flight batch instead of
+        # waiting on one fully-buffered response before the event loop resumes.
+        stream = await client.aio.models.generate_content_stream(
+            model=model,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                temperature=temperature,
+                response_mime_type="application/json",
+                response_schema=schema,
+            )
+        )
+        parts = [chunk.text async for chunk in stream if chunk.text]
+        log.debug("[AUDITOR] Received %d chunk(s) from %s", len(parts), model)
+        return "".join(parts)
 
-        # Sort by engagement score
-        scored = sorted(tweets,
-                        key=lambda t: t.get("likes", 0) + t.get("retweets", 0) * 2 + t.get("replies", 0) * 3,
-                        reverse=True)
+    def _engagement_extremes(self, tweets, scores):
+        """Format the top 5 and bottom 5 posts by engagement score."""
+        order = np.argsort(-scores, kind="stable")
 
-        top_5 = scored[:5]
-        bottom_5 = scored[-5:]
+        top_5 = [tweets[i] for i in order[:5]]
+        bottom_5 = [tweets[i] for i in order[-5:]]
 
         top_text = "\n".join(f"- [{t['author']}] {t['text'][:120]}... (likes:{t.get('likes',0)})" for t in top_5)
         bot_text = "\n".join(f"- [{t['author']}] {t['text'][:120]}... (likes:{t.get('likes',0)})" for t in bottom_5)
+        return top_text, bot_text
 
-        prompt = f"""
-TOP 5 highest-engagement competitor posts this week:
-{top_text}
-
-BOTTOM 5 lowest-engagement posts this week:
-{bot_text}
-
-TASK: What specific patterns explain why the top posts outperform the bottom posts?
-Focus on: hook structure, topic type, length, controversy level, and educational value.
-Give 3-5 specific, actionable patterns. No generic advice.
-"""
-        return gemini_with_retry(
-            self.client,
-            lambda model: self.client.models.generate_content(
-                model=model,
-                contents=prompt,
-                config=types.GenerateContentConfig(temperature=0.4)
-            ).text.strip()
-        )
+    # ─────────────────────────────────────────────
+    # LOCAL EXTRACTION (no LLM)
+    # ─────────────────────────────────────────────
 
     def _extract_audience_questions(self, tweets):
         """Pull all audience questions from comment threads — these are content goldmines."""
-        print("[AUDITOR] Extracting audience questions from comments...")
+        log.info("[AUDITOR] Extracting audience questions from comments...")
 
         questions = []
         for tweet in tweets:
             for reply in tweet.get("raw_replies", []):
                 text = reply.get("text", "")
                 # Simple question detection
-                if "?" in text or any(kw in text.lower() for kw in ["how", "what", "why", "which", "does", "can", "should", "best"]):
+                if _QUESTION_RE.search(text):
                     questions.append({
                         "question":    text,
                         "post_author": tweet["author"],
@@ -211,116 +433,49 @@ Give 3-5 specific, actionable patterns. No generic advice.
                         "likes":       reply.get("likes", 0),
                     })
 
-        # Sort by likes — most upvoted questions first
-        questions.sort(key=lambda q: q["likes"], reverse=True)
-        return questions[:15]  # Top 15 questions
+        # Top 15 questions — most upvoted first
+        return heapq.nlargest(15, questions, key=itemgetter("likes"))
 
-    def _analyze_image_posts(self, tweets):
+    def _analyze_image_posts(self, image_posts):
         """
-        Identify competitor posts that have images — flag them for the Image Analyst.
-        Returns a list of posts with images for further processing.
+        Flag competitor posts that have images for the Image Analyst.
+        Expects posts already filtered to has_images by run().
         """
-        print("[AUDITOR] Flagging image posts for visual analysis...")
+        log.info("[AUDITOR] Flagging image posts for visual analysis...")
 
-        image_posts = [t for t in tweets if t.get("has_images")]
-        flagged = []
-        for post in image_posts:
-            flagged.append({
+        flagged = [
+            {
                 "id":         post["id"],
                 "author":     post["author"],
                 "text":       post["text"],
                 "media_urls": post.get("media_urls", []),
                 "likes":      post.get("likes", 0),
                 "status":     "pending_visual_analysis",
-            })
+            }
+            for post in image_posts
+        ]
 
-        print(f"[AUDITOR] Found {len(flagged)} image posts to analyze.")
+        log.info("[AUDITOR] Found %d image posts to analyze.", len(flagged))
         return flagged
 
-    def _map_content_pillars(self, context):
-        """Map what topics each competitor keeps returning to."""
-        print("[AUDITOR] Mapping competitor content pillars...")
-
-        prompt = f"""
-Based on these competitor posts from the last 7 days:
-
-{context}
-
-What are the 3-5 recurring CONTENT PILLARS for each competitor?
-(A content pillar is a topic they post about repeatedly.)
-
-Then identify: Which pillars do they NOT cover that our audience would value?
-"""
-        return gemini_with_retry(
-            self.client,
-            lambda model: self.client.models.generate_content(
-                model=model,
-                contents=prompt,
-                config=types.GenerateContentConfig(temperature=0.4)
-            ).text.strip()
-        )
-
-    def _identify_our_opportunities(self, context):
-        """Given competitor data and our brand, what should we post this week?"""
-        print("[AUDITOR] Identifying our best opportunities this week...")
-
-        brand_name = self.brand_voice.get("brand_name", "MIC")
-        pillars = ", ".join(self.brand_voice.get("content_pillars", []))
-        hook_styles = ", ".join(self.brand_voice.get("hook_styles", []))
-        tone = self.brand_voice.get("tone", {}).get("adjectives", [])
-        examples = self.brand_voice.get("example_posts", [])
-        example_text = "\n".join(f'- "{e}"' for e in examples[:2])
-
-        prompt = f"""
-You are a senior content strategist for {brand_name}.
-
-OUR BRAND:
-- Voice: {", ".join(tone)}
-- Pillars: {pillars}
-- Hook styles we use: {hook_styles}
-
-OUR VOICE EXAMPLES:
-{example_text}
-
-COMPETITOR LANDSCAPE THIS WEEK:
-{context}
-
-TASK: Identify the TOP 3 post opportunities for {brand_name} this week.
-For each opportunity:
-1. What should we post? (topic + angle)
-2. Why will this win? (vs what competitors posted)
-3. Which hook style should we use?
-4. What format? (thread / single tweet / image post)
-
-Be specific. Reference actual competitor gaps or weaknesses where possible.
-"""
-        return gemini_with_retry(
-            self.client,
-            lambda model: self.client.models.generate_content(
-                model=model,
-                contents=prompt,
-                config=types.GenerateContentConfig(temperature=0.6)
-            ).text.strip()
-        )
-
     # ─────────────────────────────────────────────
     # SAVE
     # ─────────────────────────────────────────────
 
     def _load_intel(self):
-        if not os.path.exists(self.intel_file):
-            print(f"[WARN] Intel file not found: {self.intel_file}")
+        try:
+            return load_ndjson_cached(self.intel_file)
+        except FileNotFoundError:
+            log.warning("[WARN] Intel file not found: %s", self.intel_file)
             return None
-        with open(self.intel_file, "r", encoding="utf-8") as f:
-            return json.load(f)
 
     def _save_report(self, report):
         os.makedirs("data", exist_ok=True)
-        with open(self.report_file, "w", encoding="utf-8") as f:
-            json.dump(report, f, indent=4, ensure_ascii=False)
-        print(f"[SAVED] Deep analysis report → {self.report_file}")
+        save_json(self.report_file, report)
+        log.info("[SAVED] Deep analysis report → %s", self.report_file)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     agent = AuditorAgent()
     agent.run()
\ No newline at end of file
@@ -12,38 +12,161 @@ WHAT'S NEW in v2.0:
 """
 
 import os
-import json
-import time
+import heapq
+import asyncio
+import logging
+import orjson
 from datetime import datetime
-from google import genai
-from google.genai import types
+from functools import partial, cached_property
 from dotenv import load_dotenv
-from agents.gemini_utils import gemini_with_retry
+from agents.gemini_utils import gemini_with_retry_async, shared_client
+from agents.io_utils import read_json_or_none, read_ndjson_or_empty, load_brand_voice, save_json
+
+log = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Targets are drafted REPLY_BATCH_SIZE per Gemini call; batches run concurrently
+REPLY_BATCH_SIZE       = 5
+MAX_CONCURRENT_BATCHES = 8
+
+# Per-type reply rules, combined into one system prompt for the batched call
+REPLY_RUBRICS = {
+    "DEFENSIVE": """A follower asked a technical question. Write a community reply that:
+- Answers the question DIRECTLY in the first sentence
+- Includes at least one specific spec, product name, or number
+- Under 280 characters total
+- Never starts with "Great question!" or generic openers
+- Tone: Knowledgeable friend, not a customer service rep""",
+
+    "OFFENSIVE": """A large creator posted the tweet. Write a reply designed to:
+- Add a technical insight or data point they completely missed
+- Be subtly more authoritative than their post
+- Drive their audience to follow us
+- Under 280 characters
+- NOT just agree — add a perspective shift or deeper fact
+- No emojis. No "Nice!" or validation openers.""",
+
+    "AUDIENCE_QUESTION": """An audience member posted a question in the audio/creator community.
+Write a helpful, expert reply that:
+- Answers directly with a specific recommendation
+- Mentions a concrete product or spec
+- Under 280 characters
+- Sounds like the most knowledgeable person in the thread""",
+}
+
+# Synthetic targets for mock mode — built once at import, never mutated
+MOCK_TARGETS = (
+    {
+        "id":      "q001",
+        "author":  "NewPodcaster22",
+        "type":    "DEFENSIVE",
+        "text":    "Does the Focusrite 2i2 have enough gain for the SM7B without a Cloudlifter?",
+        "context": "Discussion about interface gain requirements",
+    },
+    {
+        "id":      "q002",
+        "author":  "mkbhd",
+        "type":    "OFFENSIVE",
+        "text":    "Just tested the DJI Mic 2. The 32-bit float recording is wild — you literally cannot clip the audio anymore.",
+        "context": "",
+    },
+    {
+        "id":      "q003",
+        "author":  "audio_beginner_99",
+        "type":    "AUDIENCE_QUESTION",
+        "text":    "What USB mic would you recommend for under $100 for podcasting?",
+        "context": "USB vs XLR mic discussion",
+    },
+)
+
+
+def _parse_replies(raw, count):
+    """{target number: reply} from the model's JSON array, for targets 1..count."""
+    return {r["target"]: str(r["reply"]).strip() for r in orjson.loads(raw)
+            if isinstance(r, dict) and r.get("target") in range(1, count + 1)}
+
+
+def _replies_complete(raw, count):
+    """True if raw parses to a reply for every one of the count targets."""
+    try:
+        return len(_parse_replies(raw, count)) == count
+    except (orjson.JSONDecodeError, KeyError, TypeError):
+        return False
+
 
 class EngagementAgent:
     def __init__(self):
+        # google-genai is heavy to import; only pay for it when an agent is built
+        from google.genai import types
+
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("[FAIL] GEMINI_API_KEY missing from .env")
-        self.client      = genai.Client(api_key=api_key)
-        self.today       = datetime.now().strftime("%Y-%m-%d")
-        self.drafts_file = f"data/engagement_drafts_{self.today}.json"
-        self.report_file = f"data/competitor_report_{self.today}.json"
-        self.intel_file  = f"data/raw_tweets_{self.today}.json"
+        self.client      = shared_client(api_key)
 
         self.brand_voice = self._load_brand_voice()
         self.brand_prompt_block = self._build_brand_prompt_block()
 
+        # The reply system prompt depends only on the brand block and rubrics —
+        # build it once so every batch sends identical bytes. That stable prefix
+        # is what Gemini's implicit cache keys on; an explicit client.caches entry
+        # would pin one key/model (the fallback chain rotates both) and the prompt
+        # is below the explicit-cache minimum size anyway.
+        rubrics = "\n".join(f"{kind}:\n{rubric}" for kind, rubric in REPLY_RUBRICS.items())
+        self._sys_replies = f"""
+{self.brand_prompt_block}
+
+You write community replies for the targets below. Each target has a TYPE.
+Follow the rubric for that TYPE:
+
+{rubrics}
+"""
+        self._reply_config = types.GenerateContentConfig(
+            system_instruction=self._sys_replies,
+            temperature=0.5,
+            response_mime_type="application/json",
+            response_schema=types.Schema(
+                type=types.Type.ARRAY,
+                items=types.Schema(
+                    type=types.Type.OBJECT,
+                    properties={
+                        "target": types.Schema(type=types.Type.INTEGER),
+                        "reply":  types.Schema(type=types.Type.STRING),
+                    },
+                    required=["target", "reply"],
+                ),
+            ),
+        )
+
+    # Resolved on first use; refresh_day() (called per run) moves a long-lived
+    # agent on to the current day without rebuilding the client and prompts.
+    @cached_property
+    def today(self):
+        return datetime.now().strftime("%Y-%m-%d")
+
+    @cached_property
+    def drafts_file(self):
+        return f"data/engagement_drafts_{self.today}.json"
+
+    @cached_property
+    def report_file(self):
+        return f"data/competitor_report_{self.today}.json"
+
+    @cached_property
+    def intel_file(self):
+        return f"data/raw_tweets_{self.today}.ndjson"
+
+    def refresh_day(self):
+        for attr in ("today", "drafts_file", "report_file", "intel_file"):
+            self.__dict__.pop(attr, None)
+
     def _load_brand_voice(self):
-        try:
-            with open("config/brand_voice.json", "r") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            print("[WARN] config/brand_voice.json not found.")
+        brand_voice = load_brand_voice()
+        if brand_voice is None:
+            log.warning("[WARN] config/brand_voice.json not found.")
             return {}
+        return brand_voice
 
     def _build_brand_prompt_block(self):
         bv = self.brand_voice
@@ -71,50 +194,63 @@ NEVER DO:
     # ─────────────────────────────────────────────
 
     def run_golden_hour_protocol(self, mock_mode=True):
-        print("[ENGAGEMENT] Engagement Agent active. Initiating Golden Hour Protocol...")
+        self.refresh_day()
+        return asyncio.run(self._run_async(mock_mode))
+
+    async def _run_async(self, mock_mode):
+        log.info("[ENGAGEMENT] Engagement Agent active. Initiating Golden Hour Protocol...")
         drafts = []
 
         # Get engagement targets
         intel = self._get_engagement_targets(mock=mock_mode)
         if not intel:
-            print("[WARN] No engagement targets available.")
+            log.warning("[WARN] No engagement targets available.")
             self._save_drafts([])
             return []
 
-        print(f"[ENGAGEMENT] Processing {len(intel)} engagement targets...")
+        log.info("[ENGAGEMENT] Processing %d engagement targets...", len(intel))
 
+        targets = []
         for item in intel:
-            try:
-                item_type = item.get("type")
-                if item_type == "DEFENSIVE":
-                    draft = self._draft_defensive_reply(item["text"], item.get("context", ""))
-                elif item_type == "OFFENSIVE":
-                    draft = self._draft_offensive_reply(item["text"], item.get("author", ""))
-                elif item_type == "AUDIENCE_QUESTION":
-                    draft = self._draft_audience_answer(item["text"], item.get("context", ""))
+            if item.get("type") in REPLY_RUBRICS:
+                targets.append(item)
+            else:
+                log.warning("[WARN] Unknown type '%s' — skipping.", item.get("type"))
+
+        # One Gemini call per batch of targets; batches are drafted concurrently
+        sem     = asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
+        batches = [targets[i:i + REPLY_BATCH_SIZE] for i in range(0, len(targets), REPLY_BATCH_SIZE)]
+        results = await asyncio.gather(*(self._draft_batch(sem, b) for b in batches),
+                                       return_exceptions=True)
+
+        generated_at = datetime.now().strftime("%Y-%m-%d %H:%M")
+        for batch, replies in zip(batches, results):
+            if isinstance(replies, BaseException):
+                log.error("[FAIL] Reply batch failed: %s: %s", type(replies).__name__, replies)
+                replies = []
+            for i, item in enumerate(batch, 1):
+                draft = replies.get(i) if replies else None
+                if draft:
+                    drafts.append(self._package(item, draft, generated_at))
                 else:
-                    print(f"[WARN] Unknown type '{item_type}' — skipping.")
-                    continue
-
-                drafts.append({
-                    "generated_at":    datetime.now().strftime("%Y-%m-%d %H:%M"),
-                    "source_tweet_id": item.get("id", ""),
-                    "source_author":   item.get("author", ""),
-                    "intent":          "Engagement",
-                    "strategy":        item_type,
-                    "original_text":   item["text"],
-                    "draft_content":   draft,
-                    "status":          "pending_review",
-                })
-                print(f"[OK] Drafted {item_type} reply for @{item.get('author', '?')}")
-                time.sleep(2)
-
-            except Exception as e:
-                print(f"[FAIL] Error for @{item.get('author', '?')}: {type(e).__name__}: {e}")
+                    log.error("[FAIL] No reply returned for @%s", item.get("author", "?"))
 
         self._save_drafts(drafts)
         return drafts
 
+    def _package(self, item, draft, generated_at):
+        log.info("[OK] Drafted %s reply for @%s", item["type"], item.get("author", "?"))
+        return {
+            "generated_at":    generated_at,
+            "source_tweet_id": item.get("id", ""),
+            "source_author":   item.get("author", ""),
+            "intent":          "Engagement",
+            "strategy":        item["type"],
+            "original_text":   item["text"],
+            "draft_content":   draft,
+            "status":          "pending_review",
+        }
+
     # ─────────────────────────────────────────────
     # ENGAGEMENT TARGET SOURCES
     # ─────────────────────────────────────────────
@@ -126,9 +262,8 @@ NEVER DO:
         targets = []
 
         # Source 1: Audience questions from auditor report
-        if os.path.exists(self.report_file):
-            with open(self.report_file, "r") as f:
-                report = json.load(f)
+        report = read_json_or_none(self.report_file)
+        if report is not None:
             questions = report.get("audience_questions", [])[:3]
             for q in questions:
                 targets.append({
@@ -140,112 +275,65 @@ NEVER DO:
                 })
 
         # Source 2: Top competitor posts for offensive replies
-        if os.path.exists(self.intel_file):
-            with open(self.intel_file, "r") as f:
-                tweets = json.load(f)
-            top_posts = sorted(tweets,
-                               key=lambda t: t.get("likes", 0),
-                               reverse=True)[:2]
-            for post in top_posts:
-                targets.append({
-                    "id":     post["id"],
-                    "author": post["author"],
-                    "type":   "OFFENSIVE",
-                    "text":   post["text"],
-                })
+        top_posts = heapq.nlargest(2, read_ndjson_or_empty(self.intel_file),
+                                   key=lambda t: t.get("likes", 0))
+        for post in top_posts:
+            targets.append({
+                "id":     post["id"],
+                "author": post["author"],
+                "type":   "OFFENSIVE",
+                "text":   post["text"],
+            })
 
         if not targets:
-            print("[WARN] No live engagement data found. Add real data in live mode.")
+            log.warning("[WARN] No live engagement data found. Add real data in live mode.")
         return targets
 
     def _mock_targets(self):
-        return [
-            {
-                "id":      "q001",
-                "author":  "NewPodcaster22",
-                "type":    "DEFENSIVE",
-                "text":    "Does the Focusrite 2i2 have enough gain for the SM7B without a Cloudlifter?",
-                "context": "Discussion about interface gain requirements",
-            },
-            {
-                "id":      "q002",
-                "author":  "mkbhd",
-                "type":    "OFFENSIVE",
-                "text":    "Just tested the DJI Mic 2. The 32-bit float recording is wild — you literally cannot clip the audio anymore.",
-                "context": "",
-            },
-            {
-                "id":      "q003",
-                "author":  "audio_beginner_99",
-                "type":    "AUDIENCE_QUESTION",
-                "text":    "What USB mic would you recommend for under $100 for podcasting?",
-                "context": "USB vs XLR mic discussion",
-            },
-        ]
+        return list(MOCK_TARGETS)
 
     # ─────────────────────────────────────────────
     # REPLY DRAFTERS
     # ─────────────────────────────────────────────
 
-    def _draft_defensive_reply(self, question, context=""):
-        system = f"""
-{self.brand_prompt_block}
-
-A follower asked a technical question. Write a community reply that:
-- Answers the question DIRECTLY in the first sentence
-- Includes at least one specific spec, product name, or number
-- Under 280 characters total
-- Never starts with "Great question!" or generic openers
-- Tone: Knowledgeable friend, not a customer service rep
-"""
-        content = f"Question: {question}"
-        if context:
-            content += f"\nContext: {context}"
-
-        return gemini_with_retry(self.client, lambda model: self.client.models.generate_content(
-            model=model,
-            contents=content,
-            config=types.GenerateContentConfig(system_instruction=system, temperature=0.4)
-        ).text.strip())
-
-    def _draft_offensive_reply(self, competitor_tweet, competitor_handle=""):
-        system = f"""
-{self.brand_prompt_block}
-
-A large creator just posted the tweet below. Write a reply designed to:
-- Add a technical insight or data point they completely missed
-- Be subtly more authoritative than their post
-- Drive their audience to follow us
-- Under 280 characters
-- NOT just agree — add a perspective shift or deeper fact
-- No emojis. No "Nice!" or validation openers.
-"""
-        return gemini_with_retry(self.client, lambda model: self.client.models.generate_content(
-            model=model,
-            contents=f"@{competitor_handle} posted: {competitor_tweet}",
-            config=types.GenerateContentConfig(system_instruction=system, temperature=0.6)
-        ).text.strip())
-
-    def _draft_audience_answer(self, question, context=""):
-        system = f"""
-{self.brand_prompt_block}
-
-An audience member posted a question in the audio/creator community.
-Write a helpful, expert reply that:
-- Answers directly with a specific recommendation
-- Mentions a concrete product or spec
-- Under 280 characters
-- Sounds like the most knowledgeable person in the thread
-"""
-        content = f"Question: {question}"
-        if context:
-            content += f"\nContext: {context}"
-
-        return gemini_with_retry(self.client, lambda model: self.client.models.generate_content(
+    async def _draft_batch(self, sem, targets):
+        async with sem:
+            return await self._draft_all(targets)
+
+    async def _draft_all(self, targets):
+        """
+        Draft replies for a batch of targets in ONE Gemini call. Each target is sent
+        numbered and tagged with its type; the model follows that type's rubric
+        and returns {target, reply} objects. Returns {target number: reply} —
+        matched by number, so a skipped or reordered item cannot shift the rest.
+        """
+        numbered = []
+        for i, t in enumerate(targets, 1):
+            line = f"{i}. [{t['type']}] @{t.get('author', '')}: {t['text']}"
+            if t.get("context"):
+                line += f"\n   Context: {t['context']}"
+            numbered.append(line)
+
+        content = (
+            "Reply to every target below. Return one object per target with its "
+            "number as `target` and your reply as `reply`.\nTargets:\n" + "\n".join(numbered)
+        )
+
+        # Only a reply for every target is cached — a partial batch is redrafted next run
+        raw = await gemini_with_retry_async(
+            partial(self._request, content),
+            cache_key=f"replies|{self._sys_replies}|{content}",
+            cache_if=lambda raw: _replies_complete(raw, len(targets)),
+        )
+        return _parse_replies(raw, len(targets))
+
+    async def _request(self, content, model, client):
+        response = await client.aio.models.generate_content(
             model=model,
             contents=content,
-            config=types.GenerateContentConfig(system_instruction=system, temperature=0.4)
-        ).text.strip())
+            config=self._reply_config,
+        )
+        return response.text
 
     # ─────────────────────────────────────────────
     # SAVE
@@ -253,11 +341,11 @@ Write a helpful, expert reply that:
 
     def _save_drafts(self, drafts):
         os.makedirs("data", exist_ok=True)
-        with open(self.drafts_file, "w", encoding="utf-8") as f:
-            json.dump(drafts, f, indent=4, ensure_ascii=False)
-        print(f"[SAVED] {len(drafts)} engagement draft(s) → {self.drafts_file}")
+        save_json(self.drafts_file, drafts)
+        log.info("[SAVED] %d engagement draft(s) → %s", len(drafts), self.drafts_file)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     agent = EngagementAgent()
     agent.run_golden_hour_protocol(mock_mode=True)
\ No newline at end of file
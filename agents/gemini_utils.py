@@ -25,14 +25,24 @@ FREE QUOTA PER ACCOUNT (as of Feb 2026):
 
 import os
 import re
-import json
 import time
+import atexit
+import random
+import asyncio
+import hashlib
+import logging
+import weakref
+import threading
+from functools import lru_cache
 from datetime import datetime, timezone
-from google import genai
+import orjson
 from dotenv import load_dotenv
+from agents.io_utils import save_json
 
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
 # ── MODEL CHAIN ─────────────────────────────────────────────
 # ORDER MATTERS: highest free quota first, lowest last
 # gemini-2.5-flash is preview — only ~50 req/day free, use last
@@ -42,14 +52,74 @@ FALLBACK_MODELS = [
     "gemini-2.5-flash",       # ~50/day free preview — last resort only
 ]
 
+# Task-specific chains (pass as models=). Routine summarisation does not need
+# the strongest model; reasoning-heavy strategy work gets it first and falls
+# back down the chain when its small free quota runs out.
+FAST_MODELS = [
+    "gemini-2.0-flash-lite",
+    "gemini-2.0-flash",
+]
+SMART_MODELS = [
+    "gemini-2.5-flash",
+    "gemini-2.0-flash",
+    "gemini-2.0-flash-lite",
+]
+
 MAX_RETRIES      = 2
 QUOTA_STATE_FILE = os.path.join("data", "quota_state.json")
+QUOTA_FLUSH_DELAY = 0.5  # seconds — a burst of exhaustions is written once
+
+# Responses for callers that pass a cache_key are kept on disk for a day, so a
+# re-run after a crash (or on unchanged intel) skips the API entirely.
+RESPONSE_CACHE_DIR = os.path.join("data", ".gemini_cache")
+RESPONSE_CACHE_TTL = 24 * 60 * 60  # seconds
+
+# Backoff for retries with no server hint: exponential, capped, with jitter so
+# concurrent callers that failed together do not all retry in lockstep.
+BACKOFF_BASE = 10   # seconds for the first retry
+BACKOFF_CAP  = 60
+
+# Adaptive pacing for the async helper: beyond the RPM bucket below, no extra
+# spacing until a (key, model) gets a 429, then call starts on it are spaced
+# out (doubling per 429, up to the cap) and the gap shrinks back towards zero
+# as calls succeed.
+PACE_MIN_INTERVAL = 1.0   # seconds between calls right after the first 429
+PACE_MAX_INTERVAL = 30.0
+PACE_RECOVERY     = 0.8   # gap multiplier per successful call
+
+# Free-tier requests-per-minute per key. The pacer lets a burst of up to this
+# many calls through at full speed, then holds the sustained rate to it —
+# so a big fan-out waits for quota instead of collecting 429s.
+MODEL_RPM = {
+    "gemini-2.0-flash-lite": 30,
+    "gemini-2.0-flash":      15,
+    "gemini-2.5-flash":      10,
+}
+DEFAULT_RPM = 15
+
+# 5xx / timeout responses are worth retrying on the same combo
+_TRANSIENT_RE = re.compile(r"^\s*(?:500|502|503|504)\b|\b(?:INTERNAL|UNAVAILABLE|DEADLINE_EXCEEDED)\b")
+
+# 429 parsing — compiled once, used on every failed attempt
+_RATE_LIMIT_RE  = re.compile(r"429|RESOURCE_EXHAUSTED")
+_LIMIT_ZERO_RE  = re.compile(r"limit['\": ]+0\b")
+_RETRY_DELAY_RE = re.compile(r"retryDelay['\": ]+(\d+(?:\.\d+)?)")
 
 
 # ── QUOTA STATE ─────────────────────────────────────────────
 class _QuotaState:
     def __init__(self):
         self._state = self._load()
+        # In memory as a set of (key_index, model) for O(1) lookups; the file
+        # keeps the [[key_index, model], ...] list format
+        self._exhausted = {tuple(x) for x in self._state.get("exhausted", [])}
+        # Per-minute 429s: (key_index, model) → time.time() it may be tried again.
+        # In memory only — a cooldown is over long before the next run.
+        self._cooldown  = {}
+        self._dirty = False
+        self._timer = None
+        self._lock  = threading.Lock()
+        atexit.register(self.flush)
 
     def _today_utc(self):
         return datetime.now(timezone.utc).strftime("%Y-%m-%d")
@@ -57,36 +127,78 @@ class _QuotaState:
     def _load(self):
         try:
             os.makedirs("data", exist_ok=True)
-            with open(QUOTA_STATE_FILE, "r") as f:
-                state = json.load(f)
+            with open(QUOTA_STATE_FILE, "rb") as f:
+                state = orjson.loads(f.read())
             if state.get("date") != self._today_utc():
-                print("[QUOTA STATE] New day — resetting.")
+                log.info("[QUOTA STATE] New day — resetting.")
                 return self._fresh()
             return state
-        except (FileNotFoundError, json.JSONDecodeError):
+        except (FileNotFoundError, orjson.JSONDecodeError):
             return self._fresh()
 
     def _fresh(self):
         return {"date": self._today_utc(), "exhausted": []}
 
     def _save(self):
+        # Called with self._lock held, so _exhausted can't change mid-sort.
+        # save_json writes then renames, so a crash never leaves a truncated file
         os.makedirs("data", exist_ok=True)
-        with open(QUOTA_STATE_FILE, "w") as f:
-            json.dump(self._state, f, indent=2)
+        self._state["exhausted"] = sorted(map(list, self._exhausted))
+        save_json(QUOTA_STATE_FILE, self._state)
+
+    def _schedule_flush(self):
+        with self._lock:
+            self._dirty = True
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(QUOTA_FLUSH_DELAY, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Persist pending changes now (also runs at interpreter exit)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            self._save()
+            self._dirty = False
 
     def is_exhausted(self, key_index, model):
-        return [key_index, model] in self._state["exhausted"]
+        return (key_index, model) in self._exhausted
 
     def mark_exhausted(self, key_index, model):
-        entry = [key_index, model]
-        if entry not in self._state["exhausted"]:
-            self._state["exhausted"].append(entry)
-            self._save()
-            print(f"    [STATE] Marked exhausted: Key {key_index + 1} / {model}")
+        entry = (key_index, model)
+        with self._lock:   # the flush timer thread may be iterating _exhausted
+            if entry in self._exhausted:
+                return
+            self._exhausted.add(entry)
+        self._schedule_flush()
+        log.info("    [STATE] Marked exhausted: Key %d / %s", key_index + 1, model)
+
+    def snapshot(self):
+        with self._lock:
+            return frozenset(self._exhausted)
+
+    def set_cooldown(self, key_index, model, until):
+        self._cooldown[(key_index, model)] = until
+
+    def is_cooling(self, key_index, model):
+        return self._cooldown.get((key_index, model), 0) > time.time()
+
+    def next_available(self, key_count, models):
+        """Earliest cooldown end among non-exhausted combos, or None if none is cooling."""
+        ends = [self._cooldown.get((ki, m), 0)
+                for ki in range(key_count) for m in models
+                if not self.is_exhausted(ki, m)]
+        ends = [t for t in ends if t > time.time()]
+        return min(ends) if ends else None
 
     def summary(self, api_keys, models):
         total = len(api_keys) * len(models)
-        dead  = len(self._state["exhausted"])
+        dead  = len(self._exhausted)
         return (f"Quota state ({self._today_utc()}): "
                 f"{total - dead}/{total} combinations available, {dead} exhausted.")
 
@@ -94,8 +206,111 @@ class _QuotaState:
 _quota_state = _QuotaState()
 
 
+# ── RESPONSE CACHE ──────────────────────────────────────────
+class _ResponseCache:
+    """One small JSON file per response, named by a hash of the request."""
+
+    def __init__(self):
+        self._purge_expired()
+
+    def _purge_expired(self):
+        """
+        Drop entries older than the TTL. Most prompts embed the day's intel and
+        are never asked again, so get() alone would leave them behind for good.
+        """
+        cutoff = time.time() - RESPONSE_CACHE_TTL
+        try:
+            entries = list(os.scandir(RESPONSE_CACHE_DIR))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            try:
+                if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def _path(self, cache_key, model_chain):
+        raw    = "\x1f".join([cache_key, *model_chain]).encode("utf-8")
+        digest = hashlib.blake2b(raw, digest_size=20).hexdigest()
+        return os.path.join(RESPONSE_CACHE_DIR, f"{digest}.json")
+
+    def get(self, cache_key, model_chain):
+        path = self._path(cache_key, model_chain)
+        try:
+            with open(path, "rb") as f:
+                entry = orjson.loads(f.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return None
+        if time.time() - entry.get("saved_at", 0) > RESPONSE_CACHE_TTL:
+            # Expired entries would otherwise pile up one file per prompt forever
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+        return entry.get("response")
+
+    def set(self, cache_key, model_chain, response):
+        if not isinstance(response, str):
+            return
+        # save_json swaps the file in whole, so a crash or a concurrent
+        # writer can't leave a truncated entry behind
+        os.makedirs(RESPONSE_CACHE_DIR, exist_ok=True)
+        save_json(self._path(cache_key, model_chain),
+                  {"saved_at": time.time(), "response": response})
+
+
+_response_cache = _ResponseCache()
+
+
+# ── PACING ──────────────────────────────────────────────────
+class _Pacer:
+    """
+    Spaces out call starts on one (key, model): a token bucket at the model's
+    RPM (as GCRA — one timestamp, no refill loop), plus an AIMD gap on 429s.
+    """
+
+    def __init__(self, rpm=DEFAULT_RPM):
+        self.interval = 0.0
+        self._next    = 0.0
+        self._period  = 60.0 / rpm            # one token every _period seconds
+        self._burst   = (rpm - 1) * self._period
+        self._tat     = 0.0                   # theoretical arrival time
+
+    async def wait(self):
+        # Reserve the slot before sleeping so concurrent callers queue up behind it
+        now         = time.monotonic()
+        self._tat   = max(self._tat, now)
+        start       = max(now, self._next, self._tat - self._burst)
+        self._tat  += self._period
+        self._next  = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def on_success(self):
+        self.interval = self.interval * PACE_RECOVERY if self.interval > 0.1 else 0.0
+
+    def on_rate_limit(self):
+        self.interval = min(PACE_MAX_INTERVAL, max(PACE_MIN_INTERVAL, self.interval * 2))
+
+
+_pacers      = {}
+_pacers_lock = threading.Lock()   # loops in different threads share the pacers
+
+
+def _pacer(key_idx, model):
+    with _pacers_lock:
+        pacer = _pacers.get((key_idx, model))
+        if pacer is None:
+            pacer = _pacers[(key_idx, model)] = _Pacer(MODEL_RPM.get(model, DEFAULT_RPM))
+    return pacer
+
+
 # ── KEY LOADING ─────────────────────────────────────────────
+@lru_cache(maxsize=1)
 def _load_api_keys():
+    """Keys come from .env, which is loaded once at import — read them once."""
     keys, seen = [], set()
     candidates = [
         os.getenv("GEMINI_API_KEY"),
@@ -107,159 +322,333 @@ def _load_api_keys():
             seen.add(key.strip())
     if not keys:
         raise ValueError("[FATAL] No Gemini API keys found in .env")
-    return keys
+    return tuple(keys)
+
+
+# Sync callers share one client per key; async callers get one per key per
+# event loop. Held weakly by loop, and dropped once asyncio.run() has closed
+# it, so a finished phase's loop and connection pool can be collected.
+_clients      = {}
+_loop_clients = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def _get_client(api_key, loop=None):
+    """
+    One genai.Client per key, reused so its HTTP connection pool survives
+    across calls. Async callers pass their running loop: aio connections are
+    bound to the loop that opened them, and each asyncio.run() is a new loop.
+    """
+    with _clients_lock:
+        if loop is None:
+            clients = _clients
+        else:
+            for closed in [l for l in _loop_clients if l.is_closed()]:
+                del _loop_clients[closed]
+            clients = _loop_clients.setdefault(loop, {})
+        client = clients.get(api_key)
+        if client is None:
+            from google import genai
+            client = clients[api_key] = genai.Client(api_key=api_key)
+        return client
+
+
+def shared_client(api_key):
+    """The process-wide client for api_key — what agents hold as self.client."""
+    return _get_client(api_key)
 
 
 # ── MAIN ENTRY POINT ────────────────────────────────────────
-def gemini_with_retry(client, build_request_fn, models=None, max_retries=MAX_RETRIES):
+def gemini_with_retry(build_request_fn, models=None, max_retries=MAX_RETRIES,
+                      cache_key=None, cache_if=None):
     """
     Multi-key, multi-model fallback with session memory.
-    Skips exhausted (key, model) pairs instantly — no wasted calls.
+    Skips exhausted (key, model) pairs instantly — no wasted calls — and
+    rate-limited ones until their cooldown ends.
+
+    cache_key: optional string identifying the request (prompt, temperature,
+    schema...). When given, a cached response younger than RESPONSE_CACHE_TTL
+    is returned without calling the API, and fresh text responses are stored.
+    cache_if: optional check on a fresh response; only responses it accepts
+    are stored, so an unusable one is retried next run instead of pinned.
+
+    build_request_fn(model, client) is called with the client for the key
+    currently being tried; use that argument, not a client captured elsewhere.
     """
     model_chain = models or FALLBACK_MODELS
+
+    if cache_key is not None:
+        cached = _response_cache.get(cache_key, model_chain)
+        if cached is not None:
+            log.info("    [CACHE] ✓ Reused cached Gemini response")
+            return cached
+
     api_keys    = _load_api_keys()
 
     # Check if anything is available before starting
-    available = [
-        (ki, m) for ki in range(len(api_keys))
-        for m in model_chain
-        if not _quota_state.is_exhausted(ki, m)
-    ]
-    if not available:
-        raise RuntimeError(
-            f"\n[FATAL] {_quota_state.summary(api_keys, model_chain)}\n"
-            "All API keys and models are exhausted for today.\n"
-            "Solutions:\n"
-            "  1. Add more keys: GEMINI_API_KEY_2=... in .env\n"
-            "     ⚠️  Each key MUST be from a DIFFERENT Gmail account.\n"
-            "     Keys from the same account share one quota pool.\n"
-            "  2. Create a new Google AI Studio project at aistudio.google.com\n"
-            "  3. Wait until midnight UTC for daily reset"
-        )
+    if not any(not _quota_state.is_exhausted(ki, m)
+               for ki in range(len(api_keys)) for m in model_chain):
+        raise _all_exhausted_error(api_keys, model_chain)
+
+    attempts    = {}
+
+    # Sweep every usable combo; a per-minute 429 puts its combo on cooldown and
+    # moves on instead of sleeping. Only when every remaining combo is cooling
+    # down do we wait — for the first one to come back — and sweep again.
+    while True:
+        for key_idx, api_key in enumerate(api_keys):
+            key_label = f"Key {key_idx + 1}/{len(api_keys)}"
+
+            alive_models = [m for m in model_chain if not _quota_state.is_exhausted(key_idx, m)]
+            if not alive_models:
+                log.debug("    [SKIP] %s — all models exhausted this session.", key_label)
+                continue
 
-    self_obj = _extract_self(build_request_fn)
+            try:
+                current_client = _get_client(api_key)
+            except Exception as e:
+                log.warning("    [KEY] Could not init %s: %s", key_label, e)
+                continue
 
-    for key_idx, api_key in enumerate(api_keys):
-        key_label = f"Key {key_idx + 1}/{len(api_keys)}"
+            for model in alive_models:
+                if _quota_state.is_cooling(key_idx, model):
+                    continue
+
+                while True:
+                    attempt = attempts[(key_idx, model)] = attempts.get((key_idx, model), 0) + 1
+                    try:
+                        result = build_request_fn(model, current_client)
+
+                        if key_idx > 0 or model != model_chain[0]:
+                            log.info("    [FALLBACK] ✓ Used %s (%s)", model, key_label)
+                        if cache_key is not None and (cache_if is None or cache_if(result)):
+                            _response_cache.set(cache_key, model_chain, result)
+                        return result
+
+                    except Exception as e:
+                        wait = _handle_error(e, key_idx, key_label, model, attempt, max_retries)
+                        if wait is None:
+                            break
+                        time.sleep(wait)
 
-        alive_models = [m for m in model_chain if not _quota_state.is_exhausted(key_idx, m)]
-        if not alive_models:
-            print(f"    [SKIP] {key_label} — all models exhausted this session.")
-            continue
+            _announce_key_switch(key_idx, key_label, api_keys, model_chain)
 
-        try:
-            current_client = genai.Client(api_key=api_key)
-        except Exception as e:
-            print(f"    [KEY] Could not init {key_label}: {e}")
-            continue
+        until = _quota_state.next_available(len(api_keys), model_chain)
+        if until is None:
+            raise _all_exhausted_error(api_keys, model_chain)
+        wait = max(0.0, until - time.time())
+        log.warning("    [COOLDOWN] Every available combo is rate limited. Waiting %.0fs...", wait)
+        time.sleep(wait)
 
-        for model in model_chain:
-            if _quota_state.is_exhausted(key_idx, model):
+
+async def gemini_with_retry_async(build_request_fn, models=None, max_retries=MAX_RETRIES,
+                                  cache_key=None, cache_if=None):
+    """
+    Async twin of gemini_with_retry — same key/model fallback, quota memory and
+    response cache, but waits use asyncio.sleep so concurrent callers keep
+    going. Calls are paced per (key, model) by _Pacer, which only
+    adds spacing once that combo has started returning 429s.
+
+    build_request_fn(model, client) must return an awaitable.
+    """
+    model_chain = models or FALLBACK_MODELS
+
+    if cache_key is not None:
+        cached = _response_cache.get(cache_key, model_chain)
+        if cached is not None:
+            log.info("    [CACHE] ✓ Reused cached Gemini response")
+            return cached
+
+    api_keys    = _load_api_keys()
+
+    if not any(not _quota_state.is_exhausted(ki, m)
+               for ki in range(len(api_keys)) for m in model_chain):
+        raise _all_exhausted_error(api_keys, model_chain)
+
+    attempts = {}
+
+    while True:
+        for key_idx, api_key in enumerate(api_keys):
+            key_label = f"Key {key_idx + 1}/{len(api_keys)}"
+
+            alive_models = [m for m in model_chain if not _quota_state.is_exhausted(key_idx, m)]
+            if not alive_models:
+                log.debug("    [SKIP] %s — all models exhausted this session.", key_label)
                 continue
 
-            for attempt in range(1, max_retries + 1):
-                try:
-                    result = _call_with_client(build_request_fn, current_client, model, self_obj)
-
-                    if key_idx > 0 or model != model_chain[0]:
-                        print(f"    [FALLBACK] ✓ Used {model} ({key_label})")
-                    return result
-
-                except Exception as e:
-                    err = str(e)
-
-                    # 404 = model retired/unavailable
-                    if "404" in err or "NOT_FOUND" in err:
-                        print(f"    [DEAD] {model} — not available (404). Skipping.")
-                        _quota_state.mark_exhausted(key_idx, model)
-                        break
-
-                    # Non-quota error → raise immediately
-                    is_quota = (
-                        "429" in err
-                        or "RESOURCE_EXHAUSTED" in err
-                        or ("quota" in err.lower() and "limit" in err.lower())
-                    )
-                    if not is_quota:
-                        raise
-
-                    # Daily quota exhausted
-                    is_daily = (
-                        bool(re.search(r"limit['\": ]+0\b", err))
-                        or ("quota" in err.lower() and "exceeded" in err.lower())
-                    )
-                    if is_daily:
-                        _quota_state.mark_exhausted(key_idx, model)
-                        print(f"    [QUOTA] {model} ({key_label}) daily exhausted → next combo")
-                        break
-
-                    # Per-minute rate limit → wait and retry
-                    if attempt < max_retries:
-                        m = re.search(r"retryDelay['\": ]+(\d+(?:\.\d+)?)", err)
-                        wait = float(m.group(1)) + 2 if m else 10 * attempt
-                        print(f"    [429] {model} ({key_label}) rate limited. "
-                              f"Waiting {wait:.0f}s (attempt {attempt}/{max_retries})...")
-                        time.sleep(wait)
-                    else:
-                        _quota_state.mark_exhausted(key_idx, model)
-                        print(f"    [429] {model} ({key_label}) retries exhausted → next combo")
-
-        if key_idx < len(api_keys) - 1:
-            remaining = sum(
-                1 for ki in range(key_idx + 1, len(api_keys))
-                for m in model_chain
-                if not _quota_state.is_exhausted(ki, m)
-            )
-            if remaining > 0:
-                print(f"    [KEY] Switching from {key_label} → Key {key_idx + 2} "
-                      f"({remaining} combos remaining)")
-
-    raise RuntimeError(
-        f"\n[FATAL] {_quota_state.summary(api_keys, model_chain)}\n"
-        "All API keys and models are exhausted for today.\n"
-        "Solutions:\n"
-        "  1. Add more keys: GEMINI_API_KEY_2=... in .env\n"
-        "     ⚠️  Each key MUST be from a DIFFERENT Gmail account.\n"
-        "     Keys from the same account share one quota pool.\n"
-        "  2. Go to aistudio.google.com → sign in with a different Gmail → Get API key\n"
-        "  3. Wait until midnight UTC for daily reset"
-    )
+            try:
+                current_client = _get_client(api_key, asyncio.get_running_loop())
+            except Exception as e:
+                log.warning("    [KEY] Could not init %s: %s", key_label, e)
+                continue
+
+            for model in alive_models:
+                if _quota_state.is_cooling(key_idx, model):
+                    continue
+
+                pacer = _pacer(key_idx, model)
+                while True:
+                    attempt = attempts[(key_idx, model)] = attempts.get((key_idx, model), 0) + 1
+                    await pacer.wait()
+                    try:
+                        result = await build_request_fn(model, current_client)
+                        pacer.on_success()
+
+                        if key_idx > 0 or model != model_chain[0]:
+                            log.info("    [FALLBACK] ✓ Used %s (%s)", model, key_label)
+                        if cache_key is not None and (cache_if is None or cache_if(result)):
+                            _response_cache.set(cache_key, model_chain, result)
+                        return result
+
+                    except Exception as e:
+                        if _is_rate_limited(e):
+                            pacer.on_rate_limit()
+                        wait = _handle_error(e, key_idx, key_label, model, attempt, max_retries)
+                        if wait is None:
+                            break
+                        await asyncio.sleep(wait)
+
+            _announce_key_switch(key_idx, key_label, api_keys, model_chain)
+
+        until = _quota_state.next_available(len(api_keys), model_chain)
+        if until is None:
+            raise _all_exhausted_error(api_keys, model_chain)
+        wait = max(0.0, until - time.time())
+        log.warning("    [COOLDOWN] Every available combo is rate limited. Waiting %.0fs...", wait)
+        await asyncio.sleep(wait)
+
+
+def quota_snapshot():
+    """The (key index, model) pairs exhausted so far today — compare two to see if a run used any up."""
+    return _quota_state.snapshot()
 
 
 def print_quota_status():
     api_keys    = _load_api_keys()
     model_chain = FALLBACK_MODELS
-    print(f"\n[QUOTA] {_quota_state.summary(api_keys, model_chain)}")
+    lines       = [f"\n[QUOTA] {_quota_state.summary(api_keys, model_chain)}"]
     for ki in range(len(api_keys)):
         for m in model_chain:
             status = "✗ EXHAUSTED" if _quota_state.is_exhausted(ki, m) else "✓ available"
-            print(f"  Key {ki + 1} / {m:<28} {status}")
-    print()
+            lines.append(f"  Key {ki + 1} / {m:<28} {status}")
+    log.info("%s\n", "\n".join(lines))
+
+
+def loads_json_array(raw):
+    """
+    Parse a JSON-array response. If the model was cut off mid-array (usually
+    max_output_tokens), keep every complete element instead of dropping the
+    whole reply: close the array after the last `}` that yields valid JSON.
+    """
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        text = raw.rstrip()
+        if not text.startswith("["):
+            raise
+        cut = text.rfind("}")
+        while cut > 0:
+            try:
+                items = orjson.loads(text[:cut + 1] + "]")
+            except orjson.JSONDecodeError:
+                cut = text.rfind("}", 0, cut)
+                continue
+            log.warning("    [PARTIAL] Truncated JSON array — recovered %d complete item(s)", len(items))
+            return items
+        raise
 
 
 # ── INTERNAL HELPERS ────────────────────────────────────────
-def _extract_self(fn):
-    if not callable(fn):
+def _handle_error(e, key_idx, key_label, model, attempt, max_retries):
+    """
+    Classify a failed call. Returns seconds to wait before retrying the same
+    (key, model) — transient errors only — or None to move on to the next combo.
+    A per-minute 429 puts the combo on cooldown and returns None. Non-quota
+    errors re-raise.
+    """
+    err = str(e)
+
+    # 404 = model retired/unavailable
+    if "404" in err or "NOT_FOUND" in err:
+        log.warning("    [DEAD] %s — not available (404). Skipping.", model)
+        _quota_state.mark_exhausted(key_idx, model)
         return None
-    try:
-        code    = getattr(fn, '__code__', None)
-        closure = getattr(fn, '__closure__', None)
-        if code and closure and 'self' in code.co_freevars:
-            idx = code.co_freevars.index('self')
-            obj = closure[idx].cell_contents
-            if hasattr(obj, 'client'):
-                return obj
-    except Exception:
-        pass
+
+    # Transient server error / timeout → back off and retry, never mark exhausted
+    if isinstance(e, TimeoutError) or _TRANSIENT_RE.search(err):
+        if attempt < max_retries:
+            wait = _backoff(attempt)
+            log.warning("    [RETRY] %s (%s) transient error. Waiting %.0fs (attempt %d/%d)...",
+                        model, key_label, wait, attempt, max_retries)
+            return wait
+        raise e
+
+    # Non-quota error → raise immediately
+    err_lower = err.lower()
+    is_quota = (
+        _is_rate_limited(e, err)
+        or ("quota" in err_lower and "limit" in err_lower)
+    )
+    if not is_quota:
+        raise e
+
+    # Daily quota exhausted
+    is_daily = (
+        bool(_LIMIT_ZERO_RE.search(err))
+        or ("quota" in err_lower and "exceeded" in err_lower)
+    )
+    if is_daily:
+        _quota_state.mark_exhausted(key_idx, model)
+        log.warning("    [QUOTA] %s (%s) daily exhausted → next combo", model, key_label)
+        return None
+
+    # Per-minute rate limit → cool this combo down and try the next one
+    if attempt < max_retries:
+        m = _RETRY_DELAY_RE.search(err)
+        wait = float(m.group(1)) + random.uniform(1, 3) if m else _backoff(attempt)
+        _quota_state.set_cooldown(key_idx, model, time.time() + wait)
+        log.info("    [429] %s (%s) rate limited. Cooling down %.0fs (attempt %d/%d) → next combo",
+                 model, key_label, wait, attempt, max_retries)
+        return None
+
+    _quota_state.mark_exhausted(key_idx, model)
+    log.warning("    [429] %s (%s) retries exhausted → next combo", model, key_label)
     return None
 
 
-def _call_with_client(build_request_fn, client, model, self_obj=None):
-    if self_obj is not None:
-        original = self_obj.client
-        try:
-            self_obj.client = client
-            return build_request_fn(model)
-        finally:
-            self_obj.client = original
-    return build_request_fn(model)
\ No newline at end of file
+def _is_rate_limited(e, err=None):
+    """429 / RESOURCE_EXHAUSTED — from the SDK's status code when present, else the message."""
+    if getattr(e, "code", None) == 429:
+        return True
+    return bool(_RATE_LIMIT_RE.search(err if err is not None else str(e)))
+
+
+def _backoff(attempt):
+    """Exponential backoff with equal jitter: somewhere in [cap/2, cap] for this attempt."""
+    ceiling = min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1))
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+def _announce_key_switch(key_idx, key_label, api_keys, model_chain):
+    if key_idx < len(api_keys) - 1:
+        remaining = sum(
+            1 for ki in range(key_idx + 1, len(api_keys))
+            for m in model_chain
+            if not _quota_state.is_exhausted(ki, m)
+        )
+        if remaining > 0:
+            log.info("    [KEY] Switching from %s → Key %d (%d combos remaining)",
+                     key_label, key_idx + 2, remaining)
+
+
+def _all_exhausted_error(api_keys, model_chain):
+    return RuntimeError(
+        f"\n[FATAL] {_quota_state.summary(api_keys, model_chain)}\n"
+        "All API keys and models are exhausted for today.\n"
+        "Solutions:\n"
+        "  1. Add more keys: GEMINI_API_KEY_2=... in .env\n"
+        "     ⚠️  Each key MUST be from a DIFFERENT Gmail account.\n"
+        "     Keys from the same account share one quota pool.\n"
+        "  2. Go to aistudio.google.com → sign in with a different Gmail → Get API key\n"
+        "  3. Wait until midnight UTC for daily reset"
+    )
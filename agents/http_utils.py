@@ -0,0 +1,125 @@
+"""
+http_utils.py — Outbound HTTP with retry
+
+Place at: mic-growth-engine/agents/http_utils.py
+
+Apify and Pollinations both shed load with 429 / 5xx and the occasional
+dropped connection. request_with_retry retries those with exponential
+backoff + jitter, and waits at least as long as the server's Retry-After
+asks so we come back when the limit has actually reset — unless that is
+longer than HTTP_BACKOFF_CAP, in which case the response is returned as is
+rather than slept on. RateLimiter keeps
+concurrent callers under a service's request rate in the first place.
+"""
+
+import time
+import random
+import logging
+import threading
+from functools import lru_cache
+from email.utils import parsedate_to_datetime
+
+import requests
+
+log = logging.getLogger(__name__)
+
+HTTP_MAX_ATTEMPTS = 4
+HTTP_BACKOFF_BASE = 1     # seconds; doubles each attempt
+HTTP_BACKOFF_CAP  = 30    # never wait longer than this between attempts
+RETRY_STATUSES    = frozenset({429, 500, 502, 503, 504})
+TRANSIENT_ERRORS  = (requests.Timeout, requests.ConnectionError)
+
+
+@lru_cache(maxsize=1)
+def shared_session():
+    """
+    One keep-alive Session for every agent in the process: phases that hit the
+    same host (Spy and Trend Hijack both call api.apify.com) reuse its pooled
+    connections instead of each paying a fresh TLS handshake.
+    """
+    return requests.Session()
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: `rate` requests per `per` seconds, bursting up
+    to `rate`. acquire() only sleeps when the bucket is empty.
+    """
+
+    def __init__(self, rate, per=60.0):
+        self.rate    = float(rate)
+        self.per     = float(per)
+        self._tokens = self.rate
+        self._ts     = time.monotonic()
+        self._lock   = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now          = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._ts) * self.rate / self.per)
+            self._ts     = now
+            self._tokens -= 1
+            # Reserve the token now; a negative balance is this caller's wait
+            wait = -self._tokens * self.per / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+def request_with_retry(method, url, session=None, max_attempts=HTTP_MAX_ATTEMPTS,
+                       idempotent=True, **kwargs):
+    """
+    Send one request, retrying timeouts, connection errors and RETRY_STATUSES.
+    Returns the last response — callers still check its status — and re-raises
+    the network error if the final attempt never got one.
+
+    idempotent=False is for requests that start paid work, such as Apify
+    run-sync calls: a read timeout means the run is already going, so only
+    connection errors (nothing reached the server) and retry statuses are retried.
+    """
+    retry_errors = TRANSIENT_ERRORS if idempotent else (requests.ConnectionError,)
+    send = (session or requests).request
+    for attempt in range(1, max_attempts + 1):
+        try:
+            response = send(method, url, **kwargs)
+        except retry_errors as e:
+            if attempt == max_attempts:
+                raise
+            wait = _backoff(attempt)
+            log.warning("    [HTTP] %s — retrying in %.1fs (attempt %d/%d)",
+                        type(e).__name__, wait, attempt, max_attempts)
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == max_attempts:
+                return response
+            retry_after = _retry_after(response)
+            if retry_after > HTTP_BACKOFF_CAP:
+                log.warning("    [HTTP] %d from %s asks for %.0fs — not retrying",
+                            response.status_code, url.split("?", 1)[0], retry_after)
+                return response
+            wait = max(retry_after, _backoff(attempt))
+            log.warning("    [HTTP] %d from %s — retrying in %.1fs (attempt %d/%d)",
+                        response.status_code, url.split("?", 1)[0], wait, attempt, max_attempts)
+            # Hand the connection back to the pool before sleeping — with
+            # stream=True the unread body would otherwise pin it until GC
+            response.close()
+        time.sleep(wait)
+
+
+def _backoff(attempt):
+    """Equal-jitter exponential backoff: somewhere in [cap/2, cap] for this attempt."""
+    ceiling = min(HTTP_BACKOFF_CAP, HTTP_BACKOFF_BASE * 2 ** attempt)
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+def _retry_after(response):
+    """Seconds the server asked us to wait (Retry-After as delta or HTTP date), else 0."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
@@ -16,166 +16,254 @@ In live mode, requires real image URLs from the Apify scraper.
 """
 
 import os
-import json
-import time
-import base64
-import requests
+import asyncio
+import hashlib
+import logging
 from datetime import datetime
-from google import genai
+from functools import cached_property
 from google.genai import types
 from dotenv import load_dotenv
-from agents.gemini_utils import gemini_with_retry
+from agents.gemini_utils import gemini_with_retry_async, shared_client
+from agents.io_utils import read_json_or_none, read_ndjson_or_empty, load_brand_voice, save_json
+from agents.http_utils import shared_session
+
+log = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Images are downloaded and analysed concurrently, this many at a time
+MAX_CONCURRENT_IMAGES = 4
+MAX_IMAGE_BYTES       = 10 * 1024 * 1024   # downloads larger than this are abandoned
+MAX_PREFETCH_BYTES    = 64 * 1024 * 1024   # images held by prefetch_images(); the rest wait for run()
+
+# Same for every image — sent as the system instruction so each vision request
+# starts with identical bytes and Gemini's implicit prefix cache can reuse it.
+VISION_PROMPT = """
+Analyze this social media image post carefully. Extract and describe:
+
+1. TEXT CONTENT: All text visible in the image, word for word
+2. VISUAL LAYOUT: How is the image designed? (dark/light, sections, icons, charts, etc.)
+3. CORE MESSAGE: What is the main point this image communicates in one sentence?
+4. CALL TO ACTION: Is there a CTA or engagement hook? What is it?
+5. EMOTIONAL TONE: What feeling does this image create? (authoritative, exciting, educational, etc.)
+6. WHAT WORKS: What is most effective about this image design?
+7. WHAT'S MISSING: What could make this image more impactful?
+
+Be specific and factual. Do not invent content.
+"""
+
+# url → (bytes, content type) fetched by prefetch_images() while the Auditor
+# runs; _analyze_image takes an entry instead of downloading it again.
+# run() empties it when done, so nothing stays in memory past the phase.
+_prefetched = {}
+
+
+def release_prefetched():
+    """Drop every prefetched image — for when Phase 3 ends, whether or not run() ran."""
+    _prefetched.clear()
+
 
 class ImageAnalystAgent:
     def __init__(self):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("[FAIL] GEMINI_API_KEY missing from .env")
-        self.client = genai.Client(api_key=api_key)
+        self.client = shared_client(api_key)
+        self._http  = shared_session()
 
-        self.today       = datetime.now().strftime("%Y-%m-%d")
-        self.report_file = f"data/competitor_report_{self.today}.json"
-        self.output_file = f"data/image_briefs_{self.today}.json"
+        # Static prompt parts go in system_instruction, built once; only the
+        # image / competitor post varies per request
+        self._vision_config = types.GenerateContentConfig(
+            system_instruction=VISION_PROMPT, temperature=0.3)
 
-        self.brand_voice = self._load_brand_voice()
+    # Resolved on first use, so building the agent does no file or clock work;
+    # refresh_day() (called per run) moves a long-lived agent to the current day.
+    @cached_property
+    def today(self):
+        return datetime.now().strftime("%Y-%m-%d")
 
-    def _load_brand_voice(self):
-        try:
-            with open("config/brand_voice.json", "r") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {}
+    @cached_property
+    def report_file(self):
+        return f"data/competitor_report_{self.today}.json"
+
+    @cached_property
+    def output_file(self):
+        return f"data/image_briefs_{self.today}.json"
+
+    @cached_property
+    def intel_file(self):
+        return f"data/raw_tweets_{self.today}.ndjson"
+
+    def refresh_day(self):
+        for attr in ("today", "report_file", "output_file", "intel_file"):
+            self.__dict__.pop(attr, None)
+
+    @cached_property
+    def brand_voice(self):
+        return load_brand_voice() or {}
+
+    @cached_property
+    def _brief_config(self):
+        return types.GenerateContentConfig(
+            system_instruction=self._build_brief_system(), temperature=0.6)
 
     # ─────────────────────────────────────────────
     # MAIN RUN
     # ─────────────────────────────────────────────
 
     def run(self, mock_mode=True):
-        print("[IMAGES] Image Analyst Agent active.")
+        self.refresh_day()
+        log.info("[IMAGES] Image Analyst Agent active.")
+
+        try:
+            if mock_mode:
+                log.info("[IMAGES] Running in MOCK mode — generating synthetic image analysis.")
+                briefs = self._mock_analysis()
+                self._save(briefs)
+                return briefs
+
+            # Load image posts flagged by the Auditor
+            image_posts = self._load_flagged_posts()
+            if not image_posts:
+                log.warning("[IMAGES] No image posts to analyze. Run Spy + Auditor agents first.")
+                self._save([])
+                return []
+
+            log.info("[IMAGES] Analyzing %d competitor image posts...", len(image_posts))
+            briefs = asyncio.run(self._analyze_all(image_posts))
 
-        if mock_mode:
-            print("[IMAGES] Running in MOCK mode — generating synthetic image analysis.")
-            briefs = self._mock_analysis()
             self._save(briefs)
             return briefs
+        finally:
+            # Prefetched images no post claimed would otherwise live for the process
+            release_prefetched()
 
-        # Load image posts flagged by the Auditor
-        image_posts = self._load_flagged_posts()
-        if not image_posts:
-            print("[IMAGES] No image posts to analyze. Run Spy + Auditor agents first.")
-            self._save([])
-            return []
+    def prefetch_images(self):
+        """
+        Download every image in today's scraped intel ahead of run(). The
+        Auditor flags all image posts for us, so these are exactly the images
+        run() will analyse; fetching them during the Auditor's Gemini calls
+        leaves run() waiting only on Vision. Failures, and images past
+        MAX_PREFETCH_BYTES in total, are left for run() to download.
+        """
+        self.refresh_day()
+        urls = list(dict.fromkeys(url for t in read_ndjson_or_empty(self.intel_file)
+                                  if t.get("has_images") for url in t.get("media_urls", [])))
+        if not urls:
+            return 0
+
+        async def fetch_all():
+            sem  = asyncio.Semaphore(MAX_CONCURRENT_IMAGES)
+            held = 0
+
+            async def fetch(url):
+                nonlocal held
+                async with sem:
+                    if held >= MAX_PREFETCH_BYTES:
+                        return False
+                    image = await asyncio.to_thread(self._download, url)
+                    if held + len(image[0]) > MAX_PREFETCH_BYTES:
+                        return False
+                    held += len(image[0])
+                    _prefetched[url] = image
+                    return True
+
+            return await asyncio.gather(*(fetch(u) for u in urls), return_exceptions=True)
+
+        fetched = sum(r is True for r in asyncio.run(fetch_all()))
+        log.info("[IMAGES] Prefetched %d/%d competitor image(s).", fetched, len(urls))
+        return fetched
+
+    async def _analyze_all(self, image_posts):
+        """Download + analyze + brief every image concurrently, at most MAX_CONCURRENT_IMAGES at once."""
+        sem  = asyncio.Semaphore(MAX_CONCURRENT_IMAGES)
+        jobs = [(post, url) for post in image_posts for url in post.get("media_urls", [])]
+        results = await asyncio.gather(*(self._process_image(sem, post, url) for post, url in jobs),
+                                       return_exceptions=True)
 
-        print(f"[IMAGES] Analyzing {len(image_posts)} competitor image posts...")
         briefs = []
-
-        for post in image_posts:
-            for url in post.get("media_urls", []):
-                print(f"[IMAGES] Analyzing image from @{post['author']}: {url[:60]}...")
-                try:
-                    analysis = self._analyze_image(url, post)
-                    if analysis:
-                        brief = self._generate_our_brief(analysis, post)
-                        briefs.append({
-                            "source_post_id":    post.get("id"),
-                            "source_author":     post.get("author"),
-                            "source_post_text":  post.get("text", ""),
-                            "image_url":         url,
-                            "image_analysis":    analysis,
-                            "our_brief":         brief,
-                            "generated_at":      self.today,
-                        })
-                        print(f"[OK] Image brief generated for @{post['author']}")
-                    time.sleep(3)  # Vision API can be slower
-                except Exception as e:
-                    print(f"[FAIL] Image analysis failed for {url[:50]}: {e}")
-
-        self._save(briefs)
+        for (post, url), result in zip(jobs, results):
+            if isinstance(result, BaseException):
+                log.error("[FAIL] Image analysis failed for %s: %s", url[:50], result)
+            elif result:
+                briefs.append(result)
         return briefs
 
+    async def _process_image(self, sem, post, url):
+        async with sem:
+            log.info("[IMAGES] Analyzing image from @%s: %s...", post["author"], url[:60])
+            analysis = await self._analyze_image(url, post)
+            if not analysis:
+                return None
+            brief = await self._generate_our_brief(analysis, post)
+            log.info("[OK] Image brief generated for @%s", post["author"])
+            return {
+                "source_post_id":    post.get("id"),
+                "source_author":     post.get("author"),
+                "source_post_text":  post.get("text", ""),
+                "image_url":         url,
+                "image_analysis":    analysis,
+                "our_brief":         brief,
+                "generated_at":      self.today,
+            }
+
     # ─────────────────────────────────────────────
     # IMAGE ANALYSIS VIA GEMINI VISION
     # ─────────────────────────────────────────────
 
-    def _analyze_image(self, image_url, post_context):
+    async def _analyze_image(self, image_url, post_context):
         """
         Download image and send to Gemini Vision for analysis.
         Gemini 2.0 Flash handles image input natively.
         """
-        # Download image
+        # Download image, unless prefetch_images() already has it
         try:
-            response = requests.get(image_url, timeout=15)
-            response.raise_for_status()
-            image_bytes = response.content
-            content_type = response.headers.get("Content-Type", "image/jpeg")
+            image_bytes, content_type = (_prefetched.pop(image_url, None)
+                                         or await asyncio.to_thread(self._download, image_url))
         except Exception as e:
-            print(f"[FAIL] Could not download image: {e}")
+            log.error("[FAIL] Could not download image: %s", e)
             return None
 
-        # Encode to base64
-        image_b64 = base64.b64encode(image_bytes).decode("utf-8")
-
-        prompt = """
-Analyze this social media image post carefully. Extract and describe:
-
-1. TEXT CONTENT: All text visible in the image, word for word
-2. VISUAL LAYOUT: How is the image designed? (dark/light, sections, icons, charts, etc.)
-3. CORE MESSAGE: What is the main point this image communicates in one sentence?
-4. CALL TO ACTION: Is there a CTA or engagement hook? What is it?
-5. EMOTIONAL TONE: What feeling does this image create? (authoritative, exciting, educational, etc.)
-6. WHAT WORKS: What is most effective about this image design?
-7. WHAT'S MISSING: What could make this image more impactful?
+        # Key the response cache on the image bytes, not the URL: the same
+        # CDN object is often re-posted or re-served under a different link
+        image_digest = hashlib.blake2b(image_bytes, digest_size=20).hexdigest()
 
-Be specific and factual. Do not invent content.
-"""
         # Build multimodal content for Gemini
         try:
-            result = gemini_with_retry(
-                self.client,
-                lambda model: self.client.models.generate_content(
-                    model=model,
-                    contents=[
-                        types.Content(parts=[
-                            types.Part(
-                                inline_data=types.Blob(
-                                    mime_type=content_type,
-                                    data=image_b64
-                                )
-                            ),
-                            types.Part(text=prompt)
-                        ])
-                    ],
-                    config=types.GenerateContentConfig(temperature=0.3)
-                ).text.strip()
+            contents = [
+                types.Content(parts=[
+                    types.Part(
+                        inline_data=types.Blob(
+                            mime_type=content_type,
+                            data=image_bytes   # raw bytes; the SDK encodes for transport
+                        )
+                    ),
+                ])
+            ]
+            result = await gemini_with_retry_async(
+                lambda model, client: self._request(client, model, contents, self._vision_config),
+                cache_key=f"vision|{VISION_PROMPT}|{image_digest}",
+                cache_if=bool,   # an empty analysis is worth another try next run
             )
             return result
         except Exception as e:
-            print(f"[FAIL] Gemini Vision analysis failed: {e}")
+            log.error("[FAIL] Gemini Vision analysis failed: %s", e)
             return None
 
-    def _generate_our_brief(self, image_analysis, source_post):
-        """Generate a creative brief for our own version of this image post."""
+    def _build_brief_system(self):
         brand_name = self.brand_voice.get("brand_name", "MIC")
         niche      = self.brand_voice.get("niche", "audio technology")
         tone_adj   = ", ".join(self.brand_voice.get("tone", {}).get("adjectives", ["direct", "technical"]))
         img_style  = self.brand_voice.get("post_formats", {}).get("image_post", {}).get("preferred_style", "")
         never_do   = "\n- ".join(self.brand_voice.get("tone", {}).get("never_do", [])[:4])
 
-        prompt = f"""
+        return f"""
 You are a content strategist for {brand_name} ({niche}).
 Our image post style: {img_style}
 Our voice: {tone_adj}
 Never: {never_do}
 
-A competitor posted this image post:
-@{source_post.get('author', '')}: "{source_post.get('text', '')}"
-
-The image contains: {image_analysis[:500]}...
-
-Create a detailed IMAGE POST BRIEF for our design team to create a better version:
+For the competitor image post you are given, create a detailed IMAGE POST BRIEF for our design team to create a better version:
 
 CONCEPT: [One sentence — what is our post about?]
 HEADLINE TEXT: [The large text for the image — punchy, under 8 words, no emojis]
@@ -185,14 +273,39 @@ CAPTION TWEET: [The tweet text that accompanies the image — under 200 chars]
 ENGAGEMENT HOOK: [One question or statement at the end to drive replies]
 WHY THIS BEATS THE COMPETITOR: [One sentence on our competitive advantage]
 """
-        return gemini_with_retry(
-            self.client,
-            lambda model: self.client.models.generate_content(
-                model=model,
-                contents=prompt,
-                config=types.GenerateContentConfig(temperature=0.6)
-            ).text.strip()
+
+    def _download(self, image_url):
+        """Stream the image into a buffer, giving up past MAX_IMAGE_BYTES."""
+        with self._http.get(image_url, stream=True, timeout=15) as response:
+            response.raise_for_status()
+            buf = bytearray()
+            for chunk in response.iter_content(chunk_size=65536):
+                buf.extend(chunk)
+                if len(buf) > MAX_IMAGE_BYTES:
+                    raise ValueError(f"image larger than {MAX_IMAGE_BYTES // (1024 * 1024)} MB")
+            return bytes(buf), response.headers.get("Content-Type", "image/jpeg")
+
+    async def _generate_our_brief(self, image_analysis, source_post):
+        """Generate a creative brief for our own version of this image post."""
+        prompt = f"""
+A competitor posted this image post:
+@{source_post.get('author', '')}: "{source_post.get('text', '')}"
+
+The image contains: {image_analysis[:500]}...
+"""
+        config = self._brief_config
+        return await gemini_with_retry_async(
+            lambda model, client: self._request(client, model, prompt, config),
+            cache_key=f"brief|{config.system_instruction}|{prompt}",
+        )
+
+    async def _request(self, client, model, contents, config):
+        response = await client.aio.models.generate_content(
+            model=model,
+            contents=contents,
+            config=config,
         )
+        return response.text.strip()
 
     # ─────────────────────────────────────────────
     # MOCK DATA
@@ -240,7 +353,7 @@ ENGAGEMENT HOOK: What interface are you running with your XLR setup?
 WHY THIS BEATS THE COMPETITOR: We include actual specs and dB numbers —
 they only gave generic bullet points.
 """,
-                "generated_at": datetime.now().strftime("%Y-%m-%d"),
+                "generated_at": self.today,
             }
         ]
 
@@ -249,19 +362,16 @@ they only gave generic bullet points.
     # ─────────────────────────────────────────────
 
     def _load_flagged_posts(self):
-        if not os.path.exists(self.report_file):
-            return []
-        with open(self.report_file, "r") as f:
-            report = json.load(f)
-        return report.get("image_post_briefs", [])
+        report = read_json_or_none(self.report_file)
+        return report.get("image_post_briefs", []) if report else []
 
     def _save(self, briefs):
         os.makedirs("data", exist_ok=True)
-        with open(self.output_file, "w", encoding="utf-8") as f:
-            json.dump(briefs, f, indent=4, ensure_ascii=False)
-        print(f"[SAVED] {len(briefs)} image brief(s) → {self.output_file}")
+        save_json(self.output_file, briefs)
+        log.info("[SAVED] %d image brief(s) → %s", len(briefs), self.output_file)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     agent = ImageAnalystAgent()
     agent.run(mock_mode=True)
\ No newline at end of file
@@ -13,15 +13,22 @@ FIX in v1.1:
 
 import os
 import re
-import json
-import time
 import random
+import shutil
+import tempfile
+import threading
+import asyncio
+import hashlib
+import logging
 import urllib.parse
 import requests
 from datetime import datetime
-from google import genai
 from google.genai import types
 from dotenv import load_dotenv
+from agents.io_utils import read_json_or_none, load_brand_voice, save_json
+from agents.http_utils import request_with_retry, shared_session, RateLimiter
+
+log = logging.getLogger(__name__)
 
 load_dotenv()
 
@@ -31,12 +38,64 @@ DASHBOARD_DIR = "social-manager-ui/public/generated"
 IMG_WIDTH     = 1080
 IMG_HEIGHT    = 1080
 
+# Briefs are prompted and generated concurrently, this many at a time
+MAX_CONCURRENT_IMAGES = 4
+POLLINATIONS_RPM      = 20   # requests per minute across all concurrent briefs
+
+# Design spec that closes every offline-built prompt
+_PROMPT_SUFFIX = (
+    "professional minimal design, white typography on dark background, "
+    "subtle blue accent lines, clean layout, "
+    "1080x1080 square format, social media post, "
+    "high contrast, no clutter, studio aesthetic"
+)
+
+# Leading bytes of the formats Pollinations returns
+_IMAGE_MAGIC = (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n")
+
+# Brief-section patterns for the offline prompt builder, compiled once;
+# the first pattern that matches wins (a HEADLINE line beats a CONCEPT line
+# wherever each appears, so these stay separate searches, not one alternation)
+_HEADLINE_RES = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r"HEADLINE[^:]*:\s*[\"']?(.+?)[\"']?\n",
+    r"CONCEPT[^:]*:\s*[\"']?(.+?)[\"']?\n",
+))
+_DATA_RES = tuple(re.compile(p, re.IGNORECASE | re.DOTALL) for p in (
+    r"DATA POINTS?.*?:(.*?)(?:\n[A-Z]|\Z)",
+    r"bullet[^:]*:(.*?)(?:\n[A-Z]|\Z)",
+))
+
+
+def _link_or_copy(src, dst):
+    """
+    Hard-link src to dst (copy where the filesystem can't link). The link or
+    copy is made under a temp name and swapped in with os.replace, so dst is
+    never missing and a file dst used to share an inode with is left alone.
+    """
+    tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def _is_image(head):
+    return head.startswith(_IMAGE_MAGIC) or (head[:4] == b"RIFF" and head[8:12] == b"WEBP")
+
 
 class ImageGeneratorAgent:
     def __init__(self):
         api_key = os.getenv("GEMINI_API_KEY")
         # Client is optional — image generation works without Gemini
-        self.client = genai.Client(api_key=api_key) if api_key else None
+        if api_key:
+            from agents.gemini_utils import shared_client
+            self.client = shared_client(api_key)
+        else:
+            self.client = None
+        self._gemini_exhausted = False   # latched on the first quota-exhausted error
+        self._http  = shared_session()
+        self._pollinations_limiter = RateLimiter(POLLINATIONS_RPM, per=60)
 
         self.today        = datetime.now().strftime("%Y-%m-%d")
         self.briefs_file  = f"data/image_briefs_{self.today}.json"
@@ -44,60 +103,105 @@ class ImageGeneratorAgent:
         self.output_file  = f"data/generated_images_{self.today}.json"
         self.brand_voice  = self._load_brand_voice()
 
+        # Brand fields read for every brief — resolve them once
+        self._brand_name  = self.brand_voice.get("brand_name", "MIC")
+        self._niche       = self.brand_voice.get("niche", "audio technology")
+        self._img_style   = (self.brand_voice.get("post_formats", {})
+                             .get("image_post", {})
+                             .get("preferred_style", "dark background, white text, minimal"))
+        self._prompt_prefix = (f"Dark background social media infographic, {self._brand_name} brand, "
+                               f"{self._niche} topic, ")
+        self._prompt_config = types.GenerateContentConfig(
+            system_instruction=self._build_prompt_system(), temperature=0.6)
+
         os.makedirs(f"{DATA_DIR}/{self.today}", exist_ok=True)
         os.makedirs(DASHBOARD_DIR, exist_ok=True)
 
     def _load_brand_voice(self):
-        try:
-            with open("config/brand_voice.json", "r") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {}
+        return load_brand_voice() or {}
 
     # ─────────────────────────────────────────────────────
     # MAIN RUN
     # ─────────────────────────────────────────────────────
-    def run(self, mock_mode=True):
-        print("[IMAGE GEN] Image Generator Agent active.")
+    def run(self, mock_mode=True, concurrency=None):
+        """concurrency: briefs in flight at once (default MAX_CONCURRENT_IMAGES)."""
+        log.info("[IMAGE GEN] Image Generator Agent active.")
         all_briefs = self._collect_briefs()
 
         if not all_briefs:
-            print("[IMAGE GEN] No image briefs found. Run Architect + Image Analyst first.")
+            log.info("[IMAGE GEN] No image briefs found. Run Architect + Image Analyst first.")
             self._save_manifest([])
             return []
 
-        print(f"[IMAGE GEN] Found {len(all_briefs)} image brief(s) to generate.")
-        generated = []
+        log.info("[IMAGE GEN] Found %d image brief(s) to generate.", len(all_briefs))
+        generated = asyncio.run(self._generate_all(all_briefs, mock_mode,
+                                                   concurrency or MAX_CONCURRENT_IMAGES))
 
-        for i, brief in enumerate(all_briefs):
-            title = brief.get("title", f"Image {i+1}")
-            print(f"\n[IMAGE GEN] Brief {i+1}/{len(all_briefs)}: {title}")
+        self._save_manifest(generated)
+        log.info("\n[IMAGE GEN] Done — %d image(s) generated.", len(generated))
+        return generated
 
-            try:
-                prompt = self._build_image_prompt(brief)
-                print(f"[IMAGE GEN] Prompt: {prompt[:90]}...")
+    async def _generate_all(self, briefs, mock_mode, concurrency):
+        """Prompt + generate every brief concurrently, at most `concurrency` at once."""
+        sem     = asyncio.Semaphore(concurrency)
+        self._prompt_jobs = {}   # prompt digest → generation task, for this run's loop
+        results = await asyncio.gather(
+            *(self._process_brief(sem, i, len(briefs), brief, mock_mode)
+              for i, brief in enumerate(briefs, 1)),
+            return_exceptions=True)
 
-                filename = f"mic_image_{self.today}_{i+1:03d}.jpg"
-                if mock_mode:
-                    result = self._mock_generate(brief, filename, prompt)
-                else:
-                    result = self._generate_image(prompt, filename)
+        generated = []
+        for i, result in enumerate(results, 1):
+            if isinstance(result, BaseException):
+                log.error("[FAIL] Brief %d: %s", i, result)
+            elif result:
+                generated.append(result)
+        return generated
 
-                if result:
-                    result["brief"]        = brief
-                    result["prompt_used"]  = prompt
-                    result["generated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                    generated.append(result)
-                    print(f"[OK] Generated: {result['filename']}")
+    async def _process_brief(self, sem, i, total, brief, mock_mode):
+        async with sem:
+            title = brief.get("title", f"Image {i}")
+            log.info("\n[IMAGE GEN] Brief %d/%d: %s", i, total, title)
 
-                time.sleep(3)
+            prompt = await self._build_image_prompt(brief)
+            log.info("[IMAGE GEN] Prompt: %s...", prompt[:90])
 
-            except Exception as e:
-                print(f"[FAIL] Brief {i+1}: {e}")
+            filename = f"mic_image_{self.today}_{i:03d}.jpg"
+            if mock_mode:
+                result = self._mock_generate(brief, filename, prompt)
+            else:
+                result = await self._generate_once(prompt, filename)
 
-        self._save_manifest(generated)
-        print(f"\n[IMAGE GEN] Done — {len(generated)} image(s) generated.")
-        return generated
+            if result:
+                result["brief"]        = brief
+                result["prompt_used"]  = prompt
+                result["generated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M")
+                log.info("[OK] Generated: %s", result["filename"])
+            return result
+
+    async def _generate_once(self, prompt, filename):
+        """
+        Render each distinct prompt once per run. A brief whose prompt is
+        already rendered (or rendering) gets hard links to that image. Sharing
+        an inode is safe because image files are only ever replaced, never
+        rewritten in place (see _generate_image and _link_or_copy).
+        """
+        key = hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).hexdigest()
+        job = self._prompt_jobs.get(key)
+        if job is None:
+            job = self._prompt_jobs[key] = asyncio.ensure_future(
+                asyncio.to_thread(self._generate_image, prompt, filename))
+            return await job
+
+        source = await job
+        if not source:
+            return None
+        data_path = f"{DATA_DIR}/{self.today}/{filename}"
+        _link_or_copy(source["data_path"], data_path)
+        _link_or_copy(data_path, f"{DASHBOARD_DIR}/{filename}")
+        log.info("[IMAGE GEN] Same prompt as %s — reusing that image.", source["filename"])
+        return {**source, "filename": filename, "data_path": data_path,
+                "public_url": f"/generated/{filename}"}
 
     # ─────────────────────────────────────────────────────
     # BRIEF COLLECTION
@@ -105,80 +209,74 @@ class ImageGeneratorAgent:
     def _collect_briefs(self):
         briefs = []
 
-        if os.path.exists(self.drafts_file):
-            with open(self.drafts_file, "r") as f:
-                drafts = json.load(f)
-            for d in drafts:
-                if d.get("intent") == "Image_Brief":
-                    briefs.append({
-                        "source":    "architect",
-                        "title":     f"Image post (via @{d.get('source_author', 'competitor')})",
-                        "raw_brief": d.get("draft_content", ""),
-                    })
-
-        if os.path.exists(self.briefs_file):
-            with open(self.briefs_file, "r") as f:
-                analyst_briefs = json.load(f)
-            for b in analyst_briefs:
+        for d in read_json_or_none(self.drafts_file) or []:
+            if d.get("intent") == "Image_Brief":
                 briefs.append({
-                    "source":    "image_analyst",
-                    "title":     f"Competitor-inspired image (@{b.get('source_author', '?')})",
-                    "raw_brief": b.get("our_brief", ""),
+                    "source":    "architect",
+                    "title":     f"Image post (via @{d.get('source_author', 'competitor')})",
+                    "raw_brief": d.get("draft_content", ""),
                 })
 
+        for b in read_json_or_none(self.briefs_file) or []:
+            briefs.append({
+                "source":    "image_analyst",
+                "title":     f"Competitor-inspired image (@{b.get('source_author', '?')})",
+                "raw_brief": b.get("our_brief", ""),
+            })
+
         return briefs
 
     # ─────────────────────────────────────────────────────
     # PROMPT BUILDING — GEMINI OPTIONAL
     # ─────────────────────────────────────────────────────
-    def _build_image_prompt(self, brief):
+    async def _build_image_prompt(self, brief):
         """
         Try Gemini first for a polished prompt.
         If quota is exhausted or no client, fall back to rule-based extraction.
         Either way, image generation always proceeds.
         """
-        # Try Gemini prompt optimisation
-        if self.client:
+        # Try Gemini prompt optimisation — unless an earlier brief found the quota gone
+        if self.client and not self._gemini_exhausted:
             try:
-                from agents.gemini_utils import gemini_with_retry
-                brand_name = self.brand_voice.get("brand_name", "MIC")
-                niche      = self.brand_voice.get("niche", "audio technology")
-                img_style  = (self.brand_voice.get("post_formats", {})
-                              .get("image_post", {})
-                              .get("preferred_style", "dark background, white text, minimal"))
-
-                system = f"""
-Convert this social media image brief into a single image generation prompt.
-Brand: {brand_name} ({niche})
-Style: {img_style}
-
-Rules:
-1. Start with: "Dark background social media infographic,"
-2. Describe headline text, data points, visual layout
-3. Include: "1080x1080 square, professional design, clean typography"
-4. Under 150 words. Output ONLY the prompt, nothing else.
-"""
+                from agents.gemini_utils import gemini_with_retry_async
                 raw_brief = brief.get("raw_brief", "")[:800]
-                prompt = gemini_with_retry(
-                    self.client,
-                    lambda model: self.client.models.generate_content(
-                        model=model,
-                        contents=f"Convert to image prompt:\n\n{raw_brief}",
-                        config=types.GenerateContentConfig(
-                            system_instruction=system, temperature=0.6)
-                    ).text.strip()
+                config    = self._prompt_config
+                return await gemini_with_retry_async(
+                    lambda model, client: self._request(
+                        client, model, f"Convert to image prompt:\n\n{raw_brief}", config),
                 )
-                return prompt
 
             except RuntimeError as e:
                 if "FATAL" in str(e) or "exhausted" in str(e).lower():
-                    print("    [IMAGE GEN] Gemini quota exhausted — using rule-based prompt.")
+                    self._gemini_exhausted = True
+                    log.warning("    [IMAGE GEN] Gemini quota exhausted — using rule-based prompt.")
                 else:
                     raise
 
         # Fallback: build prompt directly from brief text
         return self._build_prompt_from_brief(brief)
 
+    def _build_prompt_system(self):
+        return f"""
+Convert this social media image brief into a single image generation prompt.
+Brand: {self._brand_name} ({self._niche})
+Style: {self._img_style}
+
+Rules:
+1. Start with: "Dark background social media infographic,"
+2. Describe headline text, data points, visual layout
+3. Include: "1080x1080 square, professional design, clean typography"
+4. Under 150 words. Output ONLY the prompt, nothing else.
+"""
+
+    async def _request(self, client, model, contents, config):
+        response = await client.aio.models.generate_content(
+            model=model,
+            contents=contents,
+            config=config,
+        )
+        return response.text.strip()
+
     def _build_prompt_from_brief(self, brief):
         """
         Build an image prompt from brief text without any AI call.
@@ -186,25 +284,19 @@ Rules:
         Works 100% offline, zero quota used.
         """
         raw = brief.get("raw_brief", "")
-        brand_name = self.brand_voice.get("brand_name", "MIC")
-        niche = self.brand_voice.get("niche", "audio technology")
 
         # Extract headline if present in brief
         headline = ""
-        for pattern in [
-            r"HEADLINE[^:]*:\s*[\"']?(.+?)[\"']?\n",
-            r"Headline[^:]*:\s*[\"']?(.+?)[\"']?\n",
-            r"CONCEPT[^:]*:\s*[\"']?(.+?)[\"']?\n",
-        ]:
-            m = re.search(pattern, raw, re.IGNORECASE)
+        for pattern in _HEADLINE_RES:
+            m = pattern.search(raw)
             if m:
                 headline = m.group(1).strip()[:60]
                 break
 
         # Extract data points
         data_lines = []
-        for pattern in [r"DATA POINTS?.*?:(.*?)(?:\n[A-Z]|\Z)", r"bullet[^:]*:(.*?)(?:\n[A-Z]|\Z)"]:
-            m = re.search(pattern, raw, re.IGNORECASE | re.DOTALL)
+        for pattern in _DATA_RES:
+            m = pattern.search(raw)
             if m:
                 lines = [l.strip().lstrip("-•*").strip() for l in m.group(1).strip().split("\n") if l.strip()]
                 data_lines = [l for l in lines if len(l) > 5][:3]
@@ -214,18 +306,7 @@ Rules:
         headline_part = f'bold white headline "{headline}",' if headline else "bold white headline text,"
         data_part     = f"data points: {', '.join(data_lines[:2])}," if data_lines else "technical specifications and bullet points,"
 
-        prompt = (
-            f"Dark background social media infographic, {brand_name} brand, "
-            f"{niche} topic, "
-            f"{headline_part} "
-            f"{data_part} "
-            f"professional minimal design, white typography on dark background, "
-            f"subtle blue accent lines, clean layout, "
-            f"1080x1080 square format, social media post, "
-            f"high contrast, no clutter, studio aesthetic"
-        )
-
-        return prompt
+        return f"{self._prompt_prefix}{headline_part} {data_part} {_PROMPT_SUFFIX}"
 
     # ─────────────────────────────────────────────────────
     # IMAGE GENERATION — POLLINATIONS.AI (FREE, NO KEY)
@@ -233,7 +314,7 @@ Rules:
     def _generate_image(self, prompt, filename):
         for model in IMAGE_MODELS:
             try:
-                print(f"[IMAGE GEN] Calling Pollinations ({model})...")
+                log.info("[IMAGE GEN] Calling Pollinations (%s)...", model)
                 seed = random.randint(1, 999999999)
                 url = (
                     f"https://image.pollinations.ai/prompt/{urllib.parse.quote(prompt)}"
@@ -241,38 +322,66 @@ Rules:
                     f"&model={model}&seed={seed}&nologo=true&enhance=true&private=true"
                 )
 
-                response = requests.get(url, timeout=120)
-
-                if response.status_code == 200 and len(response.content) > 1000:
-                    data_path      = f"{DATA_DIR}/{self.today}/{filename}"
-                    dashboard_path = f"{DASHBOARD_DIR}/{filename}"
-
-                    with open(data_path, "wb") as f:
-                        f.write(response.content)
-                    with open(dashboard_path, "wb") as f:
-                        f.write(response.content)
-
-                    return {
-                        "filename":   filename,
-                        "data_path":  data_path,
-                        "public_url": f"/generated/{filename}",
-                        "model_used": model,
-                        "seed":       seed,
-                        "size_kb":    len(response.content) // 1024,
-                        "width":      IMG_WIDTH,
-                        "height":     IMG_HEIGHT,
-                        "status":     "generated",
-                    }
-                else:
-                    print(f"[WARN] Pollinations {model}: status {response.status_code}. Trying next...")
+                data_path      = f"{DATA_DIR}/{self.today}/{filename}"
+                dashboard_path = f"{DASHBOARD_DIR}/{filename}"
+
+                self._pollinations_limiter.acquire()
+                with request_with_retry("GET", url, session=self._http, timeout=120,
+                                        stream=True) as response:
+                    if response.status_code != 200:
+                        log.warning("[WARN] Pollinations %s: status %d. Trying next...", model, response.status_code)
+                        continue
+                    # Check the leading bytes before writing anything: an error page
+                    # served with a 200 is dropped without downloading the rest
+                    chunks = response.iter_content(chunk_size=1 << 20)
+                    head   = b""
+                    for chunk in chunks:
+                        head += chunk
+                        if len(head) >= 12:
+                            break
+                    if not _is_image(head):
+                        log.warning("[WARN] Pollinations %s: response is not an image. Trying next...", model)
+                        continue
+                    # Stream to a temp file beside data_path instead of holding the
+                    # image in memory. data_path may be hard-linked to the dashboard
+                    # copy or another brief's image, so it is only ever replaced,
+                    # never written through — a failed download leaves it intact.
+                    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(data_path), suffix=".part")
+                    try:
+                        with os.fdopen(fd, "wb") as f:
+                            f.write(head)
+                            for chunk in chunks:
+                                f.write(chunk)
+                        size = os.path.getsize(tmp_path)
+                        if size <= 1000:
+                            log.warning("[WARN] Pollinations %s: empty image (%d bytes). Trying next...", model, size)
+                            continue
+                        os.chmod(tmp_path, 0o644)
+                        os.replace(tmp_path, data_path)
+                    finally:
+                        if os.path.exists(tmp_path):
+                            os.remove(tmp_path)
+
+                _link_or_copy(data_path, dashboard_path)
+
+                return {
+                    "filename":   filename,
+                    "data_path":  data_path,
+                    "public_url": f"/generated/{filename}",
+                    "model_used": model,
+                    "seed":       seed,
+                    "size_kb":    size // 1024,
+                    "width":      IMG_WIDTH,
+                    "height":     IMG_HEIGHT,
+                    "status":     "generated",
+                }
 
             except requests.Timeout:
-                print(f"[WARN] Pollinations {model} timed out. Trying next...")
+                log.warning("[WARN] Pollinations %s timed out. Trying next...", model)
             except Exception as e:
-                print(f"[WARN] Pollinations {model}: {e}. Trying next...")
-            time.sleep(5)
+                log.warning("[WARN] Pollinations %s: %s. Trying next...", model, e)
 
-        print("[FAIL] All Pollinations models failed.")
+        log.error("[FAIL] All Pollinations models failed.")
         return None
 
     def _mock_generate(self, brief, filename, prompt):
@@ -290,11 +399,11 @@ Rules:
 
     def _save_manifest(self, generated):
         os.makedirs("data", exist_ok=True)
-        with open(self.output_file, "w", encoding="utf-8") as f:
-            json.dump(generated, f, indent=4, ensure_ascii=False)
-        print(f"[SAVED] Image manifest → {self.output_file}")
+        save_json(self.output_file, generated)
+        log.info("[SAVED] Image manifest → %s", self.output_file)
 
 
 if __name__ == "__main__":
     import sys
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     ImageGeneratorAgent().run(mock_mode="--live" not in sys.argv)
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+io_utils.py — Shared data-file helpers
+
+Place at: mic-growth-engine/agents/io_utils.py
+
+Competitor intel (data/raw_tweets_YYYY-MM-DD.ndjson) is stored as NDJSON —
+one tweet object per line, written and read a row at a time (iter_ndjson).
+The agents themselves read it through the cached loader below rather than
+streaming it: in one process they share a single parse, which costs less
+than each of them re-reading the file to keep its top few rows.
+
+When several agents run in one process (main.py), the same intel and report
+files are read by each of them. The *_cached loaders parse a file once per
+on-disk version (path + mtime + size) and hand every later caller the same
+object — treat the result as read-only.
+"""
+
+import os
+import tempfile
+from functools import lru_cache
+
+import orjson
+
+
+def iter_ndjson(filepath):
+    """Yield one decoded object per non-blank line of an NDJSON file."""
+    with open(filepath, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield orjson.loads(line)
+
+
+def _open_temp(filepath):
+    """
+    A fresh temp file beside filepath. Each writer gets its own name, so two
+    runs saving the same file at once can't interleave into one temp file —
+    the last os.replace simply wins with a complete file.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(filepath) or ".",
+                               prefix=os.path.basename(filepath) + ".", suffix=".tmp")
+    os.chmod(tmp, 0o644)   # mkstemp creates 0600; data files stay world-readable
+    return os.fdopen(fd, "wb"), tmp
+
+
+def save_ndjson(filepath, rows):
+    """Write rows as NDJSON, one compact object per line, swapped in atomically."""
+    f, tmp = _open_temp(filepath)
+    try:
+        with f:
+            for row in rows:
+                f.write(orjson.dumps(row))
+                f.write(b"\n")
+        os.replace(tmp, filepath)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def save_json(filepath, obj):
+    """
+    Write obj as indented JSON via a temp file + os.replace, so readers (and
+    the cached loaders below) never see a half-written file.
+    """
+    f, tmp = _open_temp(filepath)
+    try:
+        with f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        os.replace(tmp, filepath)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+@lru_cache(maxsize=8)
+def _parse_file(filepath, mtime_ns, size, ndjson):
+    if ndjson:
+        return tuple(iter_ndjson(filepath))
+    with open(filepath, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def load_json_cached(filepath):
+    """Parsed JSON file, re-read only when it changes on disk. Raises FileNotFoundError."""
+    st = os.stat(filepath)
+    return _parse_file(filepath, st.st_mtime_ns, st.st_size, False)
+
+
+def load_ndjson_cached(filepath):
+    """Tuple of NDJSON rows, re-read only when the file changes on disk. Raises FileNotFoundError."""
+    st = os.stat(filepath)
+    return _parse_file(filepath, st.st_mtime_ns, st.st_size, True)
+
+
+def read_json_or_none(filepath):
+    """load_json_cached, or None when the file does not exist (yet)."""
+    try:
+        return load_json_cached(filepath)
+    except FileNotFoundError:
+        return None
+
+
+def read_ndjson_or_empty(filepath):
+    """load_ndjson_cached, or () when the file does not exist (yet)."""
+    try:
+        return load_ndjson_cached(filepath)
+    except FileNotFoundError:
+        return ()
+
+
+BRAND_VOICE_FILE = os.path.join("config", "brand_voice.json")
+
+
+def load_brand_voice():
+    """The shared brand_voice.json (parsed once per version, read-only), or None if missing."""
+    return read_json_or_none(BRAND_VOICE_FILE)
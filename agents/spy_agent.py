@@ -11,46 +11,82 @@ FIXES in v2.1:
 """
 
 import os
-import json
-import requests
+import heapq
+import logging
+import orjson
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from agents.io_utils import save_ndjson, load_brand_voice
+from agents.http_utils import request_with_retry, shared_session
+
+log = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Dataset fields actually read from tweet-scraper items (posts and replies)
+APIFY_FIELDS = [
+    "id", "text", "createdAt", "author",
+    "likeCount", "retweetCount", "replyCount", "viewCount",
+    "media", "conversationId", "noResults",
+]
+
+PER_ACCOUNT_POSTS = 50   # tweets kept per competitor from the 7-day window
+ACTOR_TIMEOUT     = 120  # seconds Apify gives one account's scrape (and a comment run)
+ACTOR_TIMEOUT_MAX = 300  # run-sync endpoints stop waiting on a run after 5 minutes
+REPLY_OVERFETCH   = 3    # reply budget per post, as a multiple of the replies kept
+
+
+def _iter_jsonl(response):
+    """Decode a format=jsonl dataset response item by item as it downloads."""
+    for line in response.iter_lines():
+        if line:
+            yield orjson.loads(line)
+
 
 class SpyAgent:
     def __init__(self):
         self.apify_token   = os.getenv("APIFY_API_TOKEN")
-        self.today         = datetime.now().strftime("%Y-%m-%d")
-        self.seven_days_ago = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
-        self.output_file   = f"data/raw_tweets_{self.today}.json"
+        self._http         = shared_session()   # one TLS connection for the scrape + comment runs
+        now                = datetime.now()
+        self.today         = now.strftime("%Y-%m-%d")
+        self.seven_days_ago = (now - timedelta(days=7)).strftime("%Y-%m-%d")
+        self.output_file   = f"data/raw_tweets_{self.today}.ndjson"
 
         self.competitors   = self._load_competitors()
 
         # ✅ CORRECT actor ID (tweet-scraper, not twitter-scraper-lite)
+        # fields= projects dataset items server-side to what _to_tweet and the
+        # reply parser read; clean=1 drops empty items before they hit the wire.
+        # The run timeout is passed per request, sized to the run.
         self.actor_url = (
             "https://api.apify.com/v2/acts/apidojo~tweet-scraper"
             "/run-sync-get-dataset-items"
-            f"?token={self.apify_token}&timeout=120&memory=256"
+            f"?token={self.apify_token}&memory=256"
+            f"&format=jsonl&clean=1&fields={','.join(APIFY_FIELDS)}"
         )
 
     def _load_competitors(self):
-        try:
-            with open("config/brand_voice.json", "r") as f:
-                config = json.load(f)
-            competitors = config.get("competitor_accounts", [])
-            print(f"[SPY] Loaded {len(competitors)} competitors: {competitors}")
-            return competitors
-        except FileNotFoundError:
-            print("[WARN] brand_voice.json not found. Using defaults.")
+        config = load_brand_voice()
+        if config is None:
+            log.warning("[WARN] brand_voice.json not found. Using defaults.")
             return ["podcastage", "therecordingrevolution"]
 
+        # Drop repeated handles (case-insensitive, "@" optional) so no account
+        # is scraped, enriched and saved twice
+        unique = {}
+        for handle in config.get("competitor_accounts", []):
+            handle = handle.strip().lstrip("@")
+            if handle:
+                unique.setdefault(handle.lower(), handle)
+        competitors = list(unique.values())
+        log.info("[SPY] Loaded %d competitors: %s", len(competitors), competitors)
+        return competitors
+
     def run(self, mock_mode=True):
-        print(f"[SPY] Spy Agent active. Target window: {self.seven_days_ago} → {self.today}")
+        log.info("[SPY] Spy Agent active. Target window: %s → %s", self.seven_days_ago, self.today)
 
         if mock_mode:
-            print("[SPY] MOCK mode — using synthetic data.")
+            log.info("[SPY] MOCK mode — using synthetic data.")
             tweets = self._get_mock_data()
         else:
             tweets = self._fetch_live_data()
@@ -63,126 +99,206 @@ class SpyAgent:
     # ─────────────────────────────────────────────────────
     def _fetch_live_data(self):
         if not self.apify_token:
-            print("[FAIL] APIFY_API_TOKEN missing. Cannot run live mode.")
+            log.error("[FAIL] APIFY_API_TOKEN missing. Cannot run live mode.")
             return []
 
+        # One actor run for every competitor instead of one cold start per account
+        log.info("[SPY] Scraping %d accounts in one actor run (last 7 days)...", len(self.competitors))
+        by_account = self._scrape_accounts(self.competitors)
+
+        # ...and one more run for the comment threads of every account's top posts
+        top_posts = [t for account in self.competitors
+                     for t in self._top_posts(by_account.get(account.lower(), []))]
+        self._enrich_with_comments(top_posts)
+
         all_tweets = []
         for account in self.competitors:
-            print(f"[SPY] Scraping @{account} (last 7 days)...")
-            tweets = self._scrape_account(account)
-            enriched = self._enrich_with_comments(tweets)
-            all_tweets.extend(enriched)
-            reply_count = sum(len(t.get("raw_replies", [])) for t in enriched)
-            print(f"[SPY] @{account}: {len(tweets)} posts, {reply_count} comments fetched")
-
-        print(f"[SPY] Total: {len(all_tweets)} posts across {len(self.competitors)} accounts.")
+            tweets = by_account.get(account.lower(), [])
+            all_tweets.extend(tweets)
+            reply_count = sum(len(t.get("raw_replies", [])) for t in tweets)
+            log.info("[SPY] @%s: %d posts, %d comments fetched", account, len(tweets), reply_count)
+
+        log.info("[SPY] Total: %d posts across %d accounts.", len(all_tweets), len(self.competitors))
         return all_tweets
 
-    def _scrape_account(self, username):
+    def _scrape_accounts(self, usernames):
         """
-        Scrape tweets from one account using apidojo~tweet-scraper.
+        Scrape tweets from several accounts in ONE apidojo~tweet-scraper run,
+        then partition the results client-side by author handle.
+
+        Returns {lowercased handle: [tweet, ...]}, at most PER_ACCOUNT_POSTS
+        per account. Items whose author is not one of the requested handles
+        (e.g. retweeted posts) are dropped.
+        """
+        if not usernames:
+            return {}
+
+        handles    = {u.lower(): u for u in usernames}
+        by_account = {}
+        seen_ids   = set()   # the actor can return a tweet more than once across pages
+        self._scrape_into(usernames, handles, by_account, seen_ids)
+
+        # maxItems is shared across the run, so a prolific account can use up
+        # the budget — and a run that fails or hits its timeout part-way
+        # returns only the accounts it reached. Any account left with nothing
+        # gets a run of its own.
+        if len(usernames) > 1:
+            for u in usernames:
+                if u.lower() not in by_account:
+                    self._scrape_into([u], handles, by_account, seen_ids)
+
+        return by_account
+
+    def _scrape_into(self, usernames, handles, by_account, seen_ids):
+        """
+        Run one scrape for usernames and add their tweets to by_account.
+        Tweets collected before a failure are kept.
 
         ✅ Correct input format:
           twitterHandles: list of handles (no @)
-          maxItems:       max tweets to return
+          maxItems:       max tweets to return (PER_ACCOUNT_POSTS per account)
           sort:           "Latest" (not queryType)
           start:          date filter (since:)
         """
         payload = {
-            "twitterHandles": [username],
-            "maxItems":       50,
+            "twitterHandles": list(usernames),
+            "maxItems":       PER_ACCOUNT_POSTS * len(usernames),
             "sort":           "Latest",
             "start":          self.seven_days_ago,   # only posts from last 7 days
             "tweetLanguage":  "en",
         }
 
+        # The actor works through the handles in turn, so its run gets
+        # ACTOR_TIMEOUT per account (up to what run-sync will wait for)
+        actor_timeout = min(ACTOR_TIMEOUT_MAX, ACTOR_TIMEOUT * len(usernames))
         try:
-            response = requests.post(
+            with request_with_retry(
+                "POST",
                 self.actor_url,
+                session=self._http,
+                params={"timeout": actor_timeout},
                 json=payload,
-                timeout=130,
-                headers={"Content-Type": "application/json"}
-            )
-            response.raise_for_status()
-            raw = response.json()
-
-            return [
-                {
-                    "id":          item.get("id", ""),
-                    "author":      username,
-                    "text":        item.get("text", ""),
-                    "created_at":  item.get("createdAt", ""),
-                    "likes":       item.get("likeCount", 0),
-                    "retweets":    item.get("retweetCount", 0),
-                    "replies":     item.get("replyCount", 0),
-                    "views":       item.get("viewCount", 0),
-                    "media_urls":  [m.get("url", "") for m in item.get("media", []) if m.get("url")],
-                    "has_images":  any(m.get("type") == "photo" for m in item.get("media", [])),
-                    "type":        "TREND_ALERT" if item.get("likeCount", 0) > 100 else "OPPORTUNITY",
-                    "raw_replies": [],
-                }
-                for item in raw
-                if isinstance(item, dict) and not item.get("noResults")
-            ]
+                timeout=actor_timeout + 10,
+                headers={"Content-Type": "application/json"},
+                stream=True,
+                idempotent=False,   # a read timeout means the paid run is already under way
+            ) as response:
+                response.raise_for_status()
+                for item in _iter_jsonl(response):
+                    if not isinstance(item, dict) or item.get("noResults"):
+                        continue
+                    author = (item.get("author") or {}).get("userName", "").lower()
+                    if author not in handles or len(by_account.get(author, ())) >= PER_ACCOUNT_POSTS:
+                        continue
+                    tweet_id = item.get("id")
+                    if tweet_id:
+                        if tweet_id in seen_ids:
+                            continue
+                        seen_ids.add(tweet_id)
+                    by_account.setdefault(author, []).append(self._to_tweet(item, handles[author]))
         except Exception as e:
-            print(f"[FAIL] Could not scrape @{username}: {e}")
-            return []
+            log.error("[FAIL] Could not scrape %d accounts: %s", len(usernames), e)
+
+    def _to_tweet(self, item, username):
+        get   = item.get
+        media = get("media") or []
+        likes = get("likeCount", 0)
+        return {
+            "id":          get("id", ""),
+            "author":      username,
+            "text":        get("text", ""),
+            "created_at":  get("createdAt", ""),
+            "likes":       likes,
+            "retweets":    get("retweetCount", 0),
+            "replies":     get("replyCount", 0),
+            "views":       get("viewCount", 0),
+            "media_urls":  [m["url"] for m in media if m.get("url")],
+            "has_images":  any(m.get("type") == "photo" for m in media),
+            "type":        "TREND_ALERT" if likes > 100 else "OPPORTUNITY",
+            "raw_replies": [],
+        }
+
+    def _top_posts(self, tweets, k=3):
+        """The k highest-engagement posts that have replies worth fetching."""
+        # Posts the scrape already reports as reply-less would only add an
+        # empty conversation to the comment run — leave them out
+        return heapq.nlargest(
+            k,
+            (t for t in tweets if t["id"] and t["replies"] > 0),
+            key=lambda t: t["likes"] + t["replies"],   # _to_tweet always sets both
+        )
 
     def _enrich_with_comments(self, tweets, max_comments=3):
-        """Fetch reply threads for the top 3 highest-engagement posts."""
+        """
+        Fetch reply threads for all given posts in ONE actor run, then attach
+        up to max_comments replies to each post by conversationId.
+        """
         if not tweets:
             return tweets
 
-        top_ids = {
-            t["id"] for t in sorted(
-                tweets,
-                key=lambda t: t.get("likes", 0) + t.get("replies", 0),
-                reverse=True
-            )[:3]
+        by_id = {t["id"]: t for t in tweets}
+        self._comments_into(by_id, max_comments)
+
+        # One busy thread can still use up the shared budget, and a run cut
+        # off by its timeout stops part-way. Only posts with replies are sent,
+        # so any post still without one gets a run of its own.
+        if len(by_id) > 1:
+            for tweet_id, tweet in by_id.items():
+                if not tweet["raw_replies"]:
+                    self._comments_into({tweet_id: tweet}, max_comments)
+
+        return tweets
+
+    def _comments_into(self, by_id, max_comments):
+        """
+        Run one reply scrape for the posts in by_id and attach up to
+        max_comments replies to each.
+        """
+        # ✅ Correct field: conversationIds (not searchTerms with conversation_id:)
+        # The actor returns replies thread by thread, so the budget carries a
+        # per-post margin rather than exactly max_comments each
+        payload = {
+            "conversationIds": list(by_id),
+            "maxItems":        max_comments * REPLY_OVERFETCH * len(by_id),
+            "sort":            "Latest",
         }
 
-        for tweet in tweets:
-            if tweet["id"] not in top_ids or not tweet["id"]:
-                continue
-
-            # ✅ Correct field: conversationIds (not searchTerms with conversation_id:)
-            payload = {
-                "conversationIds": [tweet["id"]],
-                "maxItems":        max_comments,
-                "sort":            "Latest",
-            }
-
-            try:
-                response = requests.post(
-                    self.actor_url, json=payload, timeout=130,
-                    headers={"Content-Type": "application/json"}
-                )
+        try:
+            with request_with_retry(
+                "POST", self.actor_url, session=self._http, params={"timeout": ACTOR_TIMEOUT},
+                json=payload, timeout=ACTOR_TIMEOUT + 10,
+                headers={"Content-Type": "application/json"}, stream=True, idempotent=False,
+            ) as response:
                 response.raise_for_status()
-                raw_replies = response.json()
-
-                tweet["raw_replies"] = [
-                    {
-                        "author": r.get("author", {}).get("userName", "unknown"),
+                for r in _iter_jsonl(response):
+                    if not isinstance(r, dict) or r.get("noResults"):
+                        continue
+                    tweet = by_id.get(r.get("conversationId"))
+                    if tweet is None or r.get("id") == tweet["id"] or len(tweet["raw_replies"]) >= max_comments:
+                        continue
+                    tweet["raw_replies"].append({
+                        "author": (r.get("author") or {}).get("userName", "unknown"),
                         "text":   r.get("text", ""),
                         "likes":  r.get("likeCount", 0),
-                    }
-                    for r in raw_replies
-                    if isinstance(r, dict) and r.get("id") != tweet["id"] and not r.get("noResults")
-                ]
-            except Exception as e:
-                print(f"[WARN] Could not fetch comments for tweet {tweet['id']}: {e}")
-
-        return tweets
+                    })
+        except Exception as e:
+            log.warning("[WARN] Could not fetch comments for %d posts: %s", len(by_id), e)
 
     # ─────────────────────────────────────────────────────
     # MOCK DATA
     # ─────────────────────────────────────────────────────
     def _get_mock_data(self):
+        # One clock read for every row; rows are dated 1-5 days back from it
+        now = datetime.now()
+
+        def days_ago(n):
+            return (now - timedelta(days=n)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
         return [
             {
                 "id": "1001", "author": "podcastage",
                 "text": "The Rode PodMic is the best value dynamic mic for podcasting right now. Better rejection than the SM7B at 1/3 the price. Change my mind.",
-                "created_at": (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "created_at": days_ago(1),
                 "likes": 847, "retweets": 203, "replies": 91, "views": 45200,
                 "media_urls": [], "has_images": False, "type": "TREND_ALERT",
                 "raw_replies": [
@@ -193,7 +309,7 @@ class SpyAgent:
             {
                 "id": "1002", "author": "podcastage",
                 "text": "USB vs XLR mics: stop framing this as a quality debate. It's a workflow debate. USB for simplicity. XLR for control. Neither is universally better.",
-                "created_at": (datetime.now() - timedelta(days=2)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "created_at": days_ago(2),
                 "likes": 1240, "retweets": 398, "replies": 156, "views": 78300,
                 "media_urls": ["https://example.com/mock_image.jpg"], "has_images": True,
                 "type": "TREND_ALERT",
@@ -205,7 +321,7 @@ class SpyAgent:
             {
                 "id": "1003", "author": "therecordingrevolution",
                 "text": "Your home studio recording sounds bad because of the room, not the gear. I cannot stress this enough.",
-                "created_at": (datetime.now() - timedelta(days=3)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "created_at": days_ago(3),
                 "likes": 2100, "retweets": 876, "replies": 203, "views": 125000,
                 "media_urls": [], "has_images": False, "type": "TREND_ALERT",
                 "raw_replies": [
@@ -216,7 +332,7 @@ class SpyAgent:
             {
                 "id": "1004", "author": "therecordingrevolution",
                 "text": "Gain staging is the most underrated skill in home recording. Get it wrong and no plugin will fix it.",
-                "created_at": (datetime.now() - timedelta(days=4)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "created_at": days_ago(4),
                 "likes": 445, "retweets": 112, "replies": 38, "views": 22400,
                 "media_urls": [], "has_images": False, "type": "OPPORTUNITY",
                 "raw_replies": [
@@ -226,7 +342,7 @@ class SpyAgent:
             {
                 "id": "1005", "author": "podcastage",
                 "text": "Condenser vs dynamic mic for podcasting — the answer depends entirely on your room, not your budget.",
-                "created_at": (datetime.now() - timedelta(days=5)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "created_at": days_ago(5),
                 "likes": 678, "retweets": 167, "replies": 89, "views": 34100,
                 "media_urls": ["https://example.com/condenser_dynamic.jpg"], "has_images": True,
                 "type": "TREND_ALERT",
@@ -239,11 +355,11 @@ class SpyAgent:
 
     def _save(self, tweets):
         os.makedirs("data", exist_ok=True)
-        with open(self.output_file, "w", encoding="utf-8") as f:
-            json.dump(tweets, f, indent=4, ensure_ascii=False)
-        print(f"[SAVED] {len(tweets)} tweets → {self.output_file}")
+        save_ndjson(self.output_file, tweets)
+        log.info("[SAVED] %d tweets → %s", len(tweets), self.output_file)
 
 
 if __name__ == "__main__":
     import sys
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     SpyAgent().run(mock_mode="--live" not in sys.argv)
\ No newline at end of file
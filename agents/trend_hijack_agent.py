@@ -20,24 +20,85 @@ EXAMPLE:
 """
 
 import os
-import json
-import time
-import requests
+import asyncio
+import logging
 from datetime import datetime
-from google import genai
 from google.genai import types
 from dotenv import load_dotenv
-from agents.gemini_utils import gemini_with_retry
+from agents.gemini_utils import gemini_with_retry, gemini_with_retry_async, loads_json_array, shared_client
+from agents.io_utils import load_brand_voice, save_json
+from agents.http_utils import request_with_retry, shared_session
+
+log = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Approved trends are drafted DRAFT_BATCH_SIZE per Gemini call; batches run
+# concurrently and the Gemini helper paces each key/model once 429s start
+DRAFT_BATCH_SIZE      = 5
+MAX_CONCURRENT_DRAFTS = 5
+
+# Trends in these categories are scored whatever their volume — a small
+# on-niche trend is worth more to us than a huge unrelated one
+NICHE_CATEGORIES = frozenset({"Audio", "Creator Economy"})
+
+# Structured output for trend scoring: one object per trend, so the reply is
+# a JSON array Gemini is constrained to produce — no fences or prose to strip.
+_STR = types.Schema(type=types.Type.STRING)
+TREND_SCORE_SCHEMA = types.Schema(
+    type=types.Type.ARRAY,
+    items=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "topic": _STR,
+            "score": types.Schema(type=types.Type.INTEGER),
+            "angle": _STR,
+            "hook":  _STR,
+        },
+        required=["topic", "score", "angle", "hook"],
+    ),
+)
+
+# Batched drafting: one {trend number, draft} object per trend in the batch
+TREND_DRAFT_SCHEMA = types.Schema(
+    type=types.Type.ARRAY,
+    items=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "trend": types.Schema(type=types.Type.INTEGER),
+            "draft": _STR,
+        },
+        required=["trend", "draft"],
+    ),
+)
+
+
+def _compact_count(n):
+    """580000 → "580K", 1200000 → "1.2M": fewer prompt tokens than "1,200,000"."""
+    if n >= 999_500:                 # would round to "1000K"
+        return f"{n / 1_000_000:.1f}M"
+    if n >= 1_000:
+        return f"{n / 1_000:.0f}K"
+    return str(n)
+
+
+def _scores_complete(raw, trends):
+    """True if raw parses to a score for every one of the trends sent."""
+    if not isinstance(raw, str):
+        return False
+    try:
+        scored = {s.get("topic") for s in loads_json_array(raw) if isinstance(s, dict)}
+    except (ValueError, TypeError):
+        return False
+    return scored >= {t["topic"] for t in trends}
+
 
 class TrendHijackAgent:
     def __init__(self):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("[FAIL] GEMINI_API_KEY missing from .env")
-        self.client = genai.Client(api_key=api_key)
+        self.client = shared_client(api_key)
 
         self.apify_token = os.getenv("APIFY_API_TOKEN")
         self.today = datetime.now().strftime("%Y-%m-%d")
@@ -45,25 +106,40 @@ class TrendHijackAgent:
 
         self.brand_voice = self._load_brand_voice()
         self.score_threshold = self.brand_voice.get("trend_score_threshold", 7)
+        self.min_tweet_count = self.brand_voice.get("min_tweet_count", 10_000)
+
+        # Brand-derived prompt parts never change within a run — build them once.
+        # Only the trend list (scoring) and the trend itself (drafting) vary.
+        self._score_prompt_prefix, self._score_prompt_suffix = self._build_score_prompt()
+        self._score_config = types.GenerateContentConfig(
+            temperature=0.7,
+            response_mime_type="application/json",
+            response_schema=TREND_SCORE_SCHEMA,
+        )
+        self._draft_config = types.GenerateContentConfig(
+            system_instruction=self._build_draft_system(),
+            temperature=0.8,
+            response_mime_type="application/json",
+            response_schema=TREND_DRAFT_SCHEMA,
+        )
 
     def _load_brand_voice(self):
-        try:
-            with open("config/brand_voice.json", "r") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            print("[WARN] config/brand_voice.json not found.")
+        brand_voice = load_brand_voice()
+        if brand_voice is None:
+            log.warning("[WARN] config/brand_voice.json not found.")
             return {}
+        return brand_voice
 
     # ─────────────────────────────────────────────
     # MAIN RUN
     # ─────────────────────────────────────────────
 
     def run(self, mock_mode=True):
-        print(f"[TRENDS] Trend Hijack Agent active. Score threshold: {self.score_threshold}/10")
+        log.info("[TRENDS] Trend Hijack Agent active. Score threshold: %s/10", self.score_threshold)
 
         # Step 1: Get trending topics
         trends = self._get_trends(mock=mock_mode)
-        print(f"[TRENDS] Fetched {len(trends)} trending topics.")
+        log.info("[TRENDS] Fetched %d trending topics.", len(trends))
 
         # Step 2: Score each trend for audio/creator niche relevance
         scored_trends = self._score_trends(trends)
@@ -72,20 +148,12 @@ class TrendHijackAgent:
         approved = [t for t in scored_trends if t.get("score", 0) >= self.score_threshold]
         rejected = [t for t in scored_trends if t.get("score", 0) < self.score_threshold]
 
-        print(f"[TRENDS] {len(approved)} trends approved (score ≥ {self.score_threshold}), "
-              f"{len(rejected)} rejected.")
-
-        # Step 4: Draft posts for approved trends
-        for trend in approved:
-            print(f"[TRENDS] Drafting post for: {trend['topic']} (score: {trend['score']})")
-            try:
-                trend["draft"] = self._draft_trend_post(trend)
-                trend["status"] = "draft_ready"
-                time.sleep(2)
-            except Exception as e:
-                print(f"[FAIL] Could not draft for '{trend['topic']}': {e}")
-                trend["draft"] = None
-                trend["status"] = "draft_failed"
+        log.info("[TRENDS] %d trends approved (score ≥ %s), %d rejected.",
+                 len(approved), self.score_threshold, len(rejected))
+
+        # Step 4: Draft posts for approved trends, a batch per Gemini call
+        if approved:
+            asyncio.run(self._draft_all(approved))
 
         for trend in rejected:
             trend["status"] = "rejected_low_score"
@@ -111,7 +179,7 @@ class TrendHijackAgent:
             return self._mock_trends()
 
         if not self.apify_token:
-            print("[WARN] No APIFY_API_TOKEN — cannot fetch live trends. Using mock.")
+            log.warning("[WARN] No APIFY_API_TOKEN — cannot fetch live trends. Using mock.")
             return self._mock_trends()
 
         # Apify Twitter trending topics scraper
@@ -122,8 +190,10 @@ class TrendHijackAgent:
         payload = {"country": "United States", "maxItems": 15}
 
         try:
-            response = requests.post(url, json=payload, timeout=60,
-                                     headers={"Content-Type": "application/json"})
+            # Fail fast on connect; the actor run itself may take up to a minute
+            response = request_with_retry("POST", url, session=shared_session(), json=payload,
+                                          timeout=(5, 60), idempotent=False,
+                                          headers={"Content-Type": "application/json"})
             response.raise_for_status()
             raw = response.json()
             return [
@@ -135,7 +205,7 @@ class TrendHijackAgent:
                 for item in raw
             ]
         except Exception as e:
-            print(f"[FAIL] Could not fetch live trends: {e}. Using mock data.")
+            log.error("[FAIL] Could not fetch live trends: %s. Using mock data.", e)
             return self._mock_trends()
 
     def _mock_trends(self):
@@ -157,20 +227,19 @@ class TrendHijackAgent:
     # SCORING
     # ─────────────────────────────────────────────
 
-    def _score_trends(self, trends):
-        """Ask Gemini to score each trend for audio/creator niche relevance."""
-        brand_name  = self.brand_voice.get("brand_name", "MIC")
-        niche       = self.brand_voice.get("niche", "audio technology, podcast equipment")
-        pillars     = ", ".join(self.brand_voice.get("content_pillars", []))
-        trend_list  = "\n".join(f"{i+1}. {t['topic']} ({t.get('tweet_count', 0):,} tweets)" 
-                                for i, t in enumerate(trends))
+    def _build_score_prompt(self):
+        """Split the scoring prompt around the trend list: (prefix, suffix)."""
+        brand_name = self.brand_voice.get("brand_name", "MIC")
+        niche      = self.brand_voice.get("niche", "audio technology, podcast equipment")
+        pillars    = ", ".join(self.brand_voice.get("content_pillars", []))
 
-        prompt = f"""
+        prefix = f"""
 You are a creative content strategist for {brand_name}, a brand in {niche}.
 Our content pillars are: {pillars}
 
 Here are today's trending topics:
-{trend_list}
+"""
+        suffix = """
 
 TASK: For each trend, find a creative angle that connects it to audio technology, 
 microphones, podcast equipment, studio recording, or creator culture.
@@ -181,29 +250,54 @@ Rate each trend 1-10:
 - 5-6: Forced connection. Only post if it's very clever.
 - 1-4: No meaningful connection. Skip.
 
-Respond ONLY in valid JSON array format, no markdown, no explanation:
-[
-  {{
-    "topic": "exact trend name",
-    "score": 8,
-    "angle": "The creative connection to audio/creator world in 1-2 sentences",
-    "hook": "A specific tweet hook (under 280 chars) that uses this trend"
-  }}
-]
+Return one entry per trend:
+- topic: the exact trend name as listed above
+- score: the 1-10 rating
+- angle: the creative connection to the audio/creator world in 1-2 sentences
+- hook:  a specific tweet hook (under 280 chars) that uses this trend
 """
+        return prefix, suffix
+
+    def _score_trends(self, trends):
+        """Ask Gemini to score each trend for audio/creator niche relevance."""
+        # Known low-volume, off-niche trends are rejected without spending
+        # prompt tokens on them; a missing count (0) is unknown, not low
+        floor   = self.min_tweet_count
+        keep    = []
+        skipped = []
+        for t in trends:
+            if 0 < t.get("tweet_count", 0) < floor and t.get("category") not in NICHE_CATEGORIES:
+                skipped.append({**t, "score": 0, "angle": "", "hook": ""})
+            else:
+                keep.append(t)
+        if skipped:
+            log.info("[TRENDS] %d trend(s) under %s tweets skipped before scoring.", len(skipped), format(floor, ","))
+        if not keep:
+            return skipped
+        trends = keep
+
+        trend_list = "\n".join(
+            f"{i+1}. {t['topic']} ({_compact_count(t['tweet_count'])} tweets)" if t.get("tweet_count")
+            else f"{i+1}. {t['topic']}"
+            for i, t in enumerate(trends))
+        prompt     = self._score_prompt_prefix + trend_list + self._score_prompt_suffix
+
         try:
             raw_response = gemini_with_retry(
-                self.client,
-                lambda model: self.client.models.generate_content(
+                lambda model, client: client.models.generate_content(
                     model=model,
                     contents=prompt,
-                    config=types.GenerateContentConfig(temperature=0.7)
-                ).text.strip()
+                    config=self._score_config,
+                ).text,
+                # Same prompt + same set of topics → same scores; tweet counts
+                # shift hourly but don't change how a topic fits the niche
+                cache_key=f"trend-score|{self._score_config.temperature}|{self._score_prompt_prefix}|"
+                          f"{self._score_prompt_suffix}|" + "|".join(sorted(t["topic"] for t in trends)),
+                # A truncated reply (recovered by loads_json_array) would pin
+                # score 0 on the topics it lost — only cache a full set
+                cache_if=lambda raw: _scores_complete(raw, trends),
             )
-
-            # Clean JSON response
-            clean = raw_response.replace("```json", "").replace("```", "").strip()
-            scored = json.loads(clean)
+            scored = loads_json_array(raw_response)
 
             # Merge scores back into original trend data
             scored_dict = {s["topic"]: s for s in scored}
@@ -216,31 +310,58 @@ Respond ONLY in valid JSON array format, no markdown, no explanation:
                     merged = {**trend, "score": 0, "angle": "", "hook": ""}
                 result.append(merged)
 
-            return sorted(result, key=lambda t: t.get("score", 0), reverse=True)
+            return sorted(result, key=lambda t: t.get("score", 0), reverse=True) + skipped
 
         except Exception as e:
-            print(f"[FAIL] Trend scoring failed: {e}")
+            log.error("[FAIL] Trend scoring failed: %s", e)
             # Return all trends with score 0 so they get rejected
-            return [{**t, "score": 0, "angle": "", "hook": ""} for t in trends]
+            return [{**t, "score": 0, "angle": "", "hook": ""} for t in trends] + skipped
 
     # ─────────────────────────────────────────────
     # DRAFTING
     # ─────────────────────────────────────────────
 
-    def _draft_trend_post(self, trend):
+    async def _draft_all(self, approved):
+        """Draft approved trends DRAFT_BATCH_SIZE per call, at most MAX_CONCURRENT_DRAFTS calls in flight."""
+        sem     = asyncio.Semaphore(MAX_CONCURRENT_DRAFTS)
+        batches = [approved[i:i + DRAFT_BATCH_SIZE] for i in range(0, len(approved), DRAFT_BATCH_SIZE)]
+        results = await asyncio.gather(*(self._draft_batch(sem, b) for b in batches),
+                                       return_exceptions=True)
+
+        for batch, drafts in zip(batches, results):
+            if isinstance(drafts, BaseException):
+                log.error("[FAIL] Draft batch failed: %s: %s", type(drafts).__name__, drafts)
+                drafts = {}
+            for i, trend in enumerate(batch, 1):
+                draft = drafts.get(i)
+                if draft:
+                    trend["draft"]  = draft
+                    trend["status"] = "draft_ready"
+                else:
+                    log.error("[FAIL] No draft returned for '%s'", trend["topic"])
+                    trend["draft"]  = None
+                    trend["status"] = "draft_failed"
+
+    async def _draft_batch(self, sem, trends):
+        async with sem:
+            for t in trends:
+                log.info("[TRENDS] Drafting post for: %s (score: %s)", t["topic"], t["score"])
+            return await self._draft_trend_posts(trends)
+
+    def _build_draft_system(self):
         brand_name = self.brand_voice.get("brand_name", "MIC")
         tone_adj   = ", ".join(self.brand_voice.get("tone", {}).get("adjectives", ["direct", "technical"]))
         never_do   = ", ".join(self.brand_voice.get("tone", {}).get("never_do", [])[:3])
         examples   = "\n".join(f'"{e}"' for e in self.brand_voice.get("example_posts", [])[:2])
 
-        system = f"""
+        return f"""
 You are writing for {brand_name}. Voice: {tone_adj}.
 Never: {never_do}.
 
 Voice examples:
 {examples}
 
-Write a Twitter post that:
+For each trending topic you are given, write a Twitter post that:
 1. Hooks with the trending topic in the FIRST line
 2. Pivots naturally to an audio/creator insight in line 2
 3. The connection must feel clever, not forced
@@ -248,17 +369,36 @@ Write a Twitter post that:
 5. No emojis unless they serve the joke
 6. Strong opinion or surprising fact — not a generic take
 """
+
+    async def _draft_trend_posts(self, trends):
+        """
+        Draft posts for a batch of trends in ONE Gemini call. Trends are sent
+        numbered; returns {trend number: draft}, matched by number so a skipped
+        or reordered item cannot shift the rest.
+        """
+        numbered = "\n\n".join(
+            f"{i}. Trending topic: {t['topic']}\n"
+            f"   Creative angle: {t['angle']}\n"
+            f"   Suggested hook: {t['hook']}"
+            for i, t in enumerate(trends, 1))
         content = (
-            f"Trending topic: {trend['topic']}\n"
-            f"Creative angle: {trend['angle']}\n"
-            f"Suggested hook: {trend['hook']}"
+            "Write one post per trend below. Return one object per trend with its "
+            "number as `trend` and the post as `draft`.\nTrends:\n" + numbered
         )
 
-        return gemini_with_retry(self.client, lambda model: self.client.models.generate_content(
+        raw = await gemini_with_retry_async(
+            lambda model, client: self._request(client, model, content, self._draft_config),
+        )
+        return {d["trend"]: str(d["draft"]).strip() for d in loads_json_array(raw)
+                if isinstance(d, dict) and d.get("trend") in range(1, len(trends) + 1)}
+
+    async def _request(self, client, model, contents, config):
+        response = await client.aio.models.generate_content(
             model=model,
-            contents=content,
-            config=types.GenerateContentConfig(system_instruction=system, temperature=0.8)
-        ).text.strip())
+            contents=contents,
+            config=config,
+        )
+        return response.text.strip()
 
     # ─────────────────────────────────────────────
     # SAVE
@@ -266,11 +406,11 @@ Write a Twitter post that:
 
     def _save(self, result):
         os.makedirs("data", exist_ok=True)
-        with open(self.output_file, "w", encoding="utf-8") as f:
-            json.dump(result, f, indent=4, ensure_ascii=False)
-        print(f"[SAVED] Trend analysis → {self.output_file}")
+        save_json(self.output_file, result)
+        log.info("[SAVED] Trend analysis → %s", self.output_file)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     agent = TrendHijackAgent()
     agent.run(mock_mode=True)
\ No newline at end of file
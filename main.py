@@ -5,6 +5,10 @@ Run modes:
   python main.py           → mock mode (safe, no real API calls)
   python main.py --live    → live mode (real scraping + AI + image generation)
   python main.py --reset   → wipe quota state then run live
+  python main.py --fresh   → drop cached Gemini responses so every draft is written anew
+  python main.py --resume  → re-run only the phases today's last run didn't finish
+  python main.py --phases 2,5 → run only these phases, on today's files from earlier runs
+  python main.py --quiet   → warnings and errors only
 
 PHASES:
   1  Spy Agent           — 7-day competitor scraping + comments
@@ -19,149 +23,391 @@ PHASES:
 import sys
 import time
 import os
+import random
+import asyncio
+import logging
+import logging.handlers
 from datetime import datetime
 
-from agents.spy_agent             import SpyAgent
-from agents.auditor_agent         import AuditorAgent
-from agents.image_analyst_agent   import ImageAnalystAgent
-from agents.trend_hijack_agent    import TrendHijackAgent
-from agents.architect_agent       import ArchitectAgent
-from agents.engagement_agent      import EngagementAgent
-from agents.image_generator_agent import ImageGeneratorAgent
-from agents.gemini_utils          import print_quota_status, QUOTA_STATE_FILE
+log = logging.getLogger(__name__)
+
+PHASE_ATTEMPTS   = 2    # a phase killed by a network error gets one more run
+PHASE_RETRY_WAIT = 15   # seconds before that run, plus up to as much jitter
+
+LOG_BUFFER_LINES = 50   # log lines held before one write to stdout
+
+
+def _setup_logging(quiet=False):
+    """
+    Engine and agent logs all go through the root logger into one buffer that
+    is written out LOG_BUFFER_LINES at a time, after every wave, and at once
+    for warnings and errors — a few stdout writes per phase, not one per line.
+    """
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter("%(message)s"))
+    buffer = logging.handlers.MemoryHandler(LOG_BUFFER_LINES, flushLevel=logging.WARNING, target=stream)
+    logging.basicConfig(level=logging.WARNING if quiet else logging.INFO, handlers=[buffer])
+
+
+def _flush_logs():
+    for handler in logging.getLogger().handlers:
+        handler.flush()
 
 
 def print_phase(number, name):
-    print(f"\n{'='*58}")
-    print(f"  PHASE {number} — {name.upper()}")
-    print(f"{'='*58}")
+    log.info("\n%s\n  PHASE %d — %s\n%s", "=" * 58, number, name.upper(), "=" * 58)
 
 
-def print_summary(results):
-    print(f"\n{'='*58}")
-    print("  ENGINE RUN COMPLETE — MIC Growth Engine v2.3")
-    print(f"{'='*58}")
-    for key, val in results.items():
-        print(f"  {key:<40} {val}")
-    print(f"{'='*58}")
-    print("\n[ENGINE] Done. Open your Dashboard to review content.\n")
+def print_summary(results, timings):
+    lines = ["\n" + "=" * 58, "  ENGINE RUN COMPLETE — MIC Growth Engine v2.3", "=" * 58]
+    lines += [f"  {key:<40} {val}" for key, val in results.items()]
+    if timings:
+        lines.append("-" * 58)
+        # Slowest first — that is where the run's time went
+        lines += [f"  {name + ' time':<40} {secs:.2f}s"
+                  for name, secs in sorted(timings.items(), key=lambda kv: kv[1], reverse=True)]
+    lines += ["=" * 58, "\n[ENGINE] Done. Open your Dashboard to review content.\n"]
+    log.info("\n".join(lines))
 
 
-def run_engine(mock_mode=True):
-    start = datetime.now()
-    print(f"\n[ENGINE] MIC Growth Engine v2.3 starting...")
-    print(f"[ENGINE] Mode: {'MOCK (safe)' if mock_mode else 'LIVE'}")
-    print(f"[ENGINE] Started: {start.strftime('%Y-%m-%d %H:%M:%S')}")
+# ── PHASES ──────────────────────────────────────────
+# Each phase records its counts in `results` and reports its own failure, so
+# one broken phase never stops the phases running alongside or after it.
+# A phase returns True once it has finished — that is what --resume skips.
+# Agent modules (google-genai, requests, ...) are imported by the phase that
+# uses them, so `--reset` and partial runs don't pay for all seven up front.
+# A phase whose upstream produced nothing is skipped instead of spending
+# Gemini / Pollinations calls on empty input. Mock-mode agents bring their own
+# data, so only the phases that read upstream files regardless are gated there.
 
-    if not mock_mode:
-        print_quota_status()
+def _run_agent(number, run):
+    """
+    run(), re-run once if it dies on a connection error that outlasted the
+    per-request retries in http_utils — those usually clear within seconds,
+    and the Gemini response cache makes the repeat cheap. Timeouts are not
+    re-run: the request may have reached the server (a billed Apify run
+    included), so the phase goes straight to its [FAIL] handler like any
+    other error.
+    """
+    import requests
+    for attempt in range(1, PHASE_ATTEMPTS + 1):
+        try:
+            return run()
+        except requests.ConnectionError as e:
+            if attempt == PHASE_ATTEMPTS:
+                raise
+            wait = PHASE_RETRY_WAIT * (1 + random.random())
+            log.warning("[RETRY] Phase %d: %s — re-running in %.0fs", number, type(e).__name__, wait)
+            time.sleep(wait)
 
-    results = {
-        "Tweets scraped":    0,
-        "Analysis report":   "not generated",
-        "Trends approved":   0,
-        "Content drafts":    0,
-        "Engagement drafts": 0,
-        "Images generated":  0,
-    }
 
-    # ── PHASE 1: SPY ──────────────────────────────────
+def phase_spy(mock_mode, results):
     print_phase(1, "COMPETITOR INTELLIGENCE (7-DAY SCRAPE)")
     try:
-        tweets = SpyAgent().run(mock_mode=mock_mode)
+        from agents.spy_agent import SpyAgent
+        tweets = _run_agent(1, lambda: SpyAgent().run(mock_mode=mock_mode))
         results["Tweets scraped"] = len(tweets)
-        print(f"[OK] Phase 1 complete — {len(tweets)} posts collected.")
+        log.info("[OK] Phase 1 complete — %d posts collected.", len(tweets))
+        return True
     except Exception as e:
-        print(f"[FAIL] Phase 1: {e}")
-    time.sleep(1)
+        log.error("[FAIL] Phase 1: %s", e)
 
-    # ── PHASE 2: AUDITOR ──────────────────────────────
+
+def phase_auditor(mock_mode, results):
     print_phase(2, "DEEP COMPETITIVE ANALYSIS")
+    if not results["Tweets scraped"]:
+        log.info("[SKIP] Phase 2 — no tweets scraped.")
+        return
     try:
-        report = AuditorAgent().run()
+        from agents.auditor_agent import AuditorAgent
+        report = _run_agent(2, lambda: AuditorAgent().run())
         if report:
             results["Analysis report"] = "generated ✓"
-        print(f"[OK] Phase 2 complete.")
+        log.info("[OK] Phase 2 complete.")
+        return True
     except Exception as e:
-        print(f"[FAIL] Phase 2: {e}")
-    time.sleep(1)
+        log.error("[FAIL] Phase 2: %s", e)
+
 
-    # ── PHASE 3: IMAGE ANALYST ────────────────────────
+def phase_image_analyst(mock_mode, results):
     print_phase(3, "COMPETITOR IMAGE READING")
     try:
-        briefs = ImageAnalystAgent().run(mock_mode=mock_mode)
-        print(f"[OK] Phase 3 complete — {len(briefs)} competitor image(s) analysed.")
+        if not mock_mode and results["Analysis report"] == "not generated":
+            log.info("[SKIP] Phase 3 — no analysis report to read image posts from.")
+            return
+        from agents.image_analyst_agent import ImageAnalystAgent
+        briefs = _run_agent(3, lambda: ImageAnalystAgent().run(mock_mode=mock_mode))
+        results["Images analysed"] = len(briefs)
+        log.info("[OK] Phase 3 complete — %d competitor image(s) analysed.", len(briefs))
+        return True
+    except Exception as e:
+        log.error("[FAIL] Phase 3: %s", e)
+    finally:
+        # The prefetch may have filled the buffer even if run() never got to
+        # use it; only look if the module was ever loaded
+        analyst = sys.modules.get("agents.image_analyst_agent")
+        if analyst is not None:
+            analyst.release_prefetched()
+
+
+def phase_image_prefetch(mock_mode, results):
+    # No header: this only warms Phase 3's downloads while the Auditor runs
+    if mock_mode or not results["Tweets scraped"]:
+        return True
+    try:
+        from agents.image_analyst_agent import ImageAnalystAgent
+        ImageAnalystAgent().prefetch_images()
+        return True
     except Exception as e:
-        print(f"[FAIL] Phase 3: {e}")
-    time.sleep(1)
+        log.warning("[WARN] Image prefetch: %s — Phase 3 will download them itself.", e)
 
-    # ── PHASE 4: TREND HIJACK ─────────────────────────
+
+def phase_trends(mock_mode, results):
     print_phase(4, "TREND INTELLIGENCE")
     try:
-        trend_result = TrendHijackAgent().run(mock_mode=mock_mode)
+        from agents.trend_hijack_agent import TrendHijackAgent
+        trend_result = _run_agent(4, lambda: TrendHijackAgent().run(mock_mode=mock_mode))
         results["Trends approved"] = trend_result.get("approved_count", 0)
-        print(f"[OK] Phase 4 complete — {results['Trends approved']} trends approved.")
+        log.info("[OK] Phase 4 complete — %d trends approved.", results["Trends approved"])
+        return True
     except Exception as e:
-        print(f"[FAIL] Phase 4: {e}")
-    time.sleep(1)
+        log.error("[FAIL] Phase 4: %s", e)
+
 
-    # ── PHASE 5: ARCHITECT ────────────────────────────
+def phase_architect(mock_mode, results):
     print_phase(5, "CONTENT CREATION")
+    if not results["Tweets scraped"] and not results["Trends approved"]:
+        log.info("[SKIP] Phase 5 — no tweets or approved trends to write from.")
+        return
     try:
-        drafts = ArchitectAgent().run()
+        from agents.architect_agent import ArchitectAgent
+        drafts = _run_agent(5, lambda: ArchitectAgent().run())
         results["Content drafts"] = len(drafts)
         img_briefs = sum(1 for d in drafts if d.get("intent") == "Image_Brief")
-        print(f"[OK] Phase 5 complete — {len(drafts)} drafts ({img_briefs} image briefs).")
+        results["Image briefs"] = img_briefs
+        log.info("[OK] Phase 5 complete — %d drafts (%d image briefs).", len(drafts), img_briefs)
+        return True
     except Exception as e:
-        print(f"[FAIL] Phase 5: {e}")
-    time.sleep(1)
+        log.error("[FAIL] Phase 5: %s", e)
 
-    # ── PHASE 6: ENGAGEMENT ───────────────────────────
+
+def phase_engagement(mock_mode, results):
     print_phase(6, "COMMUNITY ENGAGEMENT (GOLDEN HOUR)")
+    if not mock_mode and not results["Tweets scraped"] and results["Analysis report"] == "not generated":
+        log.info("[SKIP] Phase 6 — no tweets or audience questions to reply to.")
+        return
     try:
-        eng = EngagementAgent().run_golden_hour_protocol(mock_mode=mock_mode)
+        from agents.engagement_agent import EngagementAgent
+        eng = _run_agent(6, lambda: EngagementAgent().run_golden_hour_protocol(mock_mode=mock_mode))
         results["Engagement drafts"] = len(eng)
-        print(f"[OK] Phase 6 complete — {len(eng)} engagement draft(s).")
+        log.info("[OK] Phase 6 complete — %d engagement draft(s).", len(eng))
+        return True
     except Exception as e:
-        print(f"[FAIL] Phase 6: {e}")
-    time.sleep(1)
+        log.error("[FAIL] Phase 6: %s", e)
+
+
+def _image_concurrency():
+    """
+    Phase 7 briefs in flight at once, from MIC_IMAGE_CONCURRENCY; None (the
+    image generator's default) when unset or not a positive integer.
+    Pollinations is still held to POLLINATIONS_RPM inside the agent.
+    """
+    value = os.getenv("MIC_IMAGE_CONCURRENCY", "").strip()
+    if not value:
+        return None
+    try:
+        concurrency = int(value)
+    except ValueError:
+        concurrency = 0
+    if concurrency <= 0:
+        log.warning("[WARN] MIC_IMAGE_CONCURRENCY=%r is not a positive integer — using the default.", value)
+        return None
+    return concurrency
 
-    # ── PHASE 7: IMAGE GENERATOR ──────────────────────
+
+def phase_image_generator(mock_mode, results):
     print_phase(7, "IMAGE GENERATION (POLLINATIONS.AI — FREE, NO KEY NEEDED)")
+    if not mock_mode and not results["Images analysed"] and not results["Image briefs"]:
+        log.info("[SKIP] Phase 7 — no image briefs to generate from.")
+        return
     try:
-        images = ImageGeneratorAgent().run(mock_mode=mock_mode)
+        from agents.image_generator_agent import ImageGeneratorAgent
+        images = _run_agent(7, lambda: ImageGeneratorAgent().run(mock_mode=mock_mode,
+                                                                 concurrency=_image_concurrency()))
         results["Images generated"] = len(images)
         if mock_mode:
-            print(f"[OK] Phase 7 complete — {len(images)} brief(s) queued.")
-            print("     Run with --live to generate real images.")
+            log.info("[OK] Phase 7 complete — %d brief(s) queued.", len(images))
+            log.info("     Run with --live to generate real images.")
         else:
-            print(f"[OK] Phase 7 complete — {len(images)} image(s) generated.")
-            print("     Saved to: data/generated_images/ + social-manager-ui/public/generated/")
+            log.info("[OK] Phase 7 complete — %d image(s) generated.", len(images))
+            log.info("     Saved to: data/generated_images/ + social-manager-ui/public/generated/")
+        return True
     except Exception as e:
-        print(f"[FAIL] Phase 7: {e}")
+        log.error("[FAIL] Phase 7: %s", e)
+
+
+# Phases grouped by the data files they hand on. Every phase in a wave only
+# reads what earlier waves wrote, so a wave's phases run side by side:
+#   Spy, Trend Hijack           → raw_tweets, trend_analysis
+#   Auditor, image prefetch     → competitor_report        (need raw_tweets)
+#   Image Analyst, Architect,   → image_briefs, drafts,    (need the report;
+#     Engagement                  engagement_drafts         Architect the trends)
+#   Image Generator             → generated_images         (needs briefs + drafts)
+PHASE_WAVES = [
+    (phase_spy, phase_trends),
+    (phase_auditor, phase_image_prefetch),
+    (phase_image_analyst, phase_architect, phase_engagement),
+    (phase_image_generator,),
+]
+
+# --phases numbers; the prefetch belongs to the phase it warms up
+PHASE_NUMBERS = {
+    phase_spy: 1, phase_auditor: 2, phase_image_prefetch: 3, phase_image_analyst: 3,
+    phase_trends: 4, phase_architect: 5, phase_engagement: 6, phase_image_generator: 7,
+}
+
+
+def _parse_phases(value):
+    """--phases value → set of phase numbers; exits with a usage message on anything else."""
+    valid = set(PHASE_NUMBERS.values())
+    try:
+        phases = {int(n) for n in value.split(",") if n.strip()}
+    except ValueError:
+        phases = set()
+    if not phases or not phases <= valid:
+        sys.exit(f"[USAGE] --phases takes phase numbers {min(valid)}-{max(valid)}, "
+                 f"comma-separated (e.g. --phases 2,5) — got {value!r}")
+    return phases
+
+
+# Counts and finished phases, saved after every wave so a crash mid-run
+# keeps what was done and --resume can pick up from there
+LAST_RUN_FILE = os.path.join("data", "last_run.json")
+
+
+def _load_last_run(today, mock_mode):
+    """The saved state of today's last run in this mode, or None."""
+    from agents.io_utils import read_json_or_none
+    state = read_json_or_none(LAST_RUN_FILE)
+    if not state or state.get("date") != today or state.get("mock_mode") != mock_mode:
+        return None
+    return state
+
+
+def _persist(today, mock_mode, results, completed):
+    from agents.io_utils import save_json
+    os.makedirs("data", exist_ok=True)
+    save_json(LAST_RUN_FILE, {
+        "date":      today,
+        "mock_mode": mock_mode,
+        "completed": sorted(completed),
+        "results":   results,
+    })
+
+
+def _timed(phase, mock_mode, results, timings):
+    """Run one phase, recording its wall time under its name ("spy", "auditor", ...)."""
+    t0 = time.perf_counter()
+    try:
+        return phase(mock_mode, results)
+    finally:
+        timings[phase.__name__.removeprefix("phase_")] = time.perf_counter() - t0
+
+
+async def run_engine(mock_mode=True, resume=False, phases=None):
+    start = datetime.now()
+    t0    = time.perf_counter()
+    log.info("\n[ENGINE] MIC Growth Engine v2.3 starting...")
+    log.info("[ENGINE] Mode: %s", "MOCK (safe)" if mock_mode else "LIVE")
+    log.info("[ENGINE] Started: %s", start.strftime("%Y-%m-%d %H:%M:%S"))
 
     if not mock_mode:
+        from agents.gemini_utils import print_quota_status, quota_snapshot
+        print_quota_status()
+        quota_at_start = quota_snapshot()
+
+    results = {
+        "Tweets scraped":    0,
+        "Analysis report":   "not generated",
+        "Images analysed":   0,
+        "Trends approved":   0,
+        "Content drafts":    0,
+        "Image briefs":      0,
+        "Engagement drafts": 0,
+        "Images generated":  0,
+    }
+    today     = start.strftime("%Y-%m-%d")
+    completed = set()
+    timings   = {}
+
+    # A partial run starts from today's saved counts too, so the phases it
+    # skips still look done to the upstream checks of the ones it runs
+    last_run = _load_last_run(today, mock_mode) if resume or phases else None
+    if last_run:
+        results.update(last_run["results"])
+        completed.update(last_run["completed"])
+    if resume:
+        if last_run:
+            log.info("[ENGINE] Resuming — already done: %s", ", ".join(sorted(completed)) or "nothing")
+        else:
+            log.info("[ENGINE] Nothing to resume from today — running every phase.")
+    if phases:
+        log.info("[ENGINE] Running phase(s) %s only.", ", ".join(map(str, sorted(phases))))
+        if not last_run:
+            log.info("[ENGINE] No earlier run today — phases that need upstream data may skip.")
+
+    # Agents are blocking (several run their own event loop), so each phase
+    # gets a worker thread; a wave finishes before the next one starts
+    for wave in PHASE_WAVES:
+        pending = [phase for phase in wave
+                   if (PHASE_NUMBERS[phase] in phases if phases else phase.__name__ not in completed)]
+        done    = await asyncio.gather(*(asyncio.to_thread(_timed, phase, mock_mode, results, timings)
+                                         for phase in pending))
+        completed.update(phase.__name__ for phase, ok in zip(pending, done) if ok)
+        _persist(today, mock_mode, results, completed)
+        _flush_logs()
+
+    # The table only changes if this run exhausted a key/model — reprint just then
+    if not mock_mode and quota_snapshot() != quota_at_start:
         print_quota_status()
 
-    elapsed = (datetime.now() - start).seconds
-    results["Total runtime"] = f"{elapsed}s"
-    print_summary(results)
+    results["Total runtime"] = f"{time.perf_counter() - t0:.2f}s"
+    print_summary(results, timings)
 
 
 if __name__ == "__main__":
     args = sys.argv[1:]
+    _setup_logging(quiet="--quiet" in args)
 
     if "--reset" in args:
+        from agents.gemini_utils import QUOTA_STATE_FILE
         if os.path.exists(QUOTA_STATE_FILE):
             os.remove(QUOTA_STATE_FILE)
-            print(f"[RESET] Quota state cleared.")
+            log.info("[RESET] Quota state cleared.")
         args = [a for a in args if a != "--reset"]
 
+    if "--fresh" in args:
+        import shutil
+        from agents.gemini_utils import RESPONSE_CACHE_DIR
+        if os.path.isdir(RESPONSE_CACHE_DIR):
+            shutil.rmtree(RESPONSE_CACHE_DIR)
+            log.info("[FRESH] Cached Gemini responses cleared.")
+
+    resume = "--resume" in args
+
+    # --phases 1,3,5 (or --phases=1,3,5)
+    phases = None
+    for i, a in enumerate(args):
+        if a == "--phases" or a.startswith("--phases="):
+            value  = a.partition("=")[2] if "=" in a else (args[i + 1] if i + 1 < len(args) else "")
+            phases = _parse_phases(value)
+            break
+
     live_mode = "--live" in args
     if live_mode:
-        print("\n  LIVE MODE — Real API calls + image generation will run.")
-        print("   Phase 7 calls Pollinations.ai (100% free, no API key needed).")
-        print("   Press Ctrl+C within 3 seconds to cancel.\n")
+        log.warning("\n  LIVE MODE — Real API calls + image generation will run.\n"
+                    "   Phase 7 calls Pollinations.ai (100% free, no API key needed).\n"
+                    "   Press Ctrl+C within 3 seconds to cancel.\n")
         time.sleep(3)
 
-    run_engine(mock_mode=not live_mode)
\ No newline at end of file
+    asyncio.run(run_engine(mock_mode=not live_mode, resume=resume, phases=phases))
\ No newline at end of file